@@ -1,13 +1,22 @@
 import os
 import json
+import functools
 import time
+import click
 import requests
+from requests.adapters import HTTPAdapter
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from flask import Flask, render_template, request, session, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect, make_url
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import DeclarativeBase
+import tempfile
+import threading
 import uuid
+from urllib.parse import urlsplit
 
 class Base(DeclarativeBase):
     pass
@@ -35,16 +44,60 @@ if database_url.startswith("postgres://"):
 elif database_url.startswith("postgresql://"):
     database_url = database_url.replace("postgresql://", "postgresql+psycopg://", 1)
 app.config["SQLALCHEMY_DATABASE_URI"] = database_url
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
+
+# SQLite (the default, and production on the Fly volume) is tuned per
+# connection. WAL lets readers in either gunicorn worker carry on while one
+# commits, instead of the rollback journal's database-wide lock;
+# synchronous=NORMAL is crash-safe under WAL and fsyncs at checkpoints rather
+# than on every commit; the page cache and memory map keep hot index pages in
+# memory; and a writer that finds the database busy waits for it rather than
+# failing with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -8192,              # KiB, per connection
+    "mmap_size": 128 * 1024 * 1024,   # bytes, shared through the OS page cache
+    "busy_timeout": 5000,             # ms
 }
+SQLITE = database_url.startswith("sqlite")
+if SQLITE:
+    # A file can't drop a connection the way a server does, so there is
+    # nothing to pre-ping or recycle; a small persistent pool (one connection
+    # per gunicorn thread, plus headroom) keeps each connection's PRAGMAs and
+    # warm cache instead of reopening the file. In-memory databases get
+    # SQLAlchemy's own single-connection pools, which take no sizing.
+    in_memory = make_url(database_url).database in (None, '', ':memory:')
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {} if in_memory else {"pool_size": 5, "max_overflow": 5}
+else:
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
 # initialize the app with the extension, flask-sqlalchemy >= 3.0.x
 db.init_app(app)
 
+def _configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+if SQLITE:
+    with app.app_context():
+        event.listen(db.engine, "connect", _configure_sqlite)
+
 # Import models after db is created to avoid circular import
+import cache
+import cooccurrence
+import exclusions
+import identity
 import models
+import neighborhood
+import outbound
 import recommender
+import scoring
+import textsim
+import writebehind
 
 with app.app_context():
     db.create_all()
@@ -63,66 +116,305 @@ GOOGLE_BOOKS_BASE_URL = "https://www.googleapis.com/books/v1"
 # the app still works fully for anonymous guests.
 GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID")
 
+# Global cap on concurrent outbound API calls per worker process. Every
+# recommendation fan-out runs on one shared executor of this size, and the
+# HTTP connection pool is sized to match so no connection is opened just to
+# be thrown away when the pool overflows (urllib3 keeps only 10 by default).
+OUTBOUND_CONCURRENCY = int(os.environ.get("OUTBOUND_CONCURRENCY", "16"))
+# Hedged calls (see `hedger` below) run on pools of their own - up to
+# OUTBOUND_CONCURRENCY primaries plus HEDGE_WORKERS duplicates - and the
+# connection pool has room for those next to calls made inline.
+HEDGE_WORKERS = max(1, OUTBOUND_CONCURRENCY // 2)
+HTTP_POOL_SIZE = 2 * OUTBOUND_CONCURRENCY + HEDGE_WORKERS
+
 # Shared connection-pooled session for all outbound API calls (reuses TCP/TLS
 # connections instead of opening a new one per request).
 http = requests.Session()
-
-# Simple in-process TTL cache for outbound API responses. Search/suggestion
-# queries and genre-based discover results repeat a lot across users, so
-# caching them cuts outbound API calls significantly. Not shared across
-# processes/workers, which is fine at this app's scale.
-_cache = {}
-_CACHE_MAX_ENTRIES = 500
+http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE))
+http.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE))
+
+# In-process cache for outbound API responses. Search/suggestion queries,
+# credits, per-title recommendation lists and genre-based discover results
+# repeat a lot across users, so caching them cuts outbound API calls
+# significantly. Bounded by approximate memory (CACHE_MAX_MB, per worker)
+# with LRU eviction, and per-namespace lifetimes from cache.TTL_POLICY; see
+# cache.py. Not shared across processes/workers (the disk tier below is).
+_cache = cache.ResponseCache(max_bytes=int(os.environ.get("CACHE_MAX_MB", "64")) * 1024 * 1024)
+
+# Optional persistent tier under the in-memory one: a SQLite file (on the
+# /data volume in production) shared by both gunicorn workers, so deploys and
+# worker restarts start warm. Disabled unless RESPONSE_CACHE_PATH is set.
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH")
+_disk_cache = cache.DiskCache(RESPONSE_CACHE_PATH) if RESPONSE_CACHE_PATH else None
+
+# Optional item-item co-occurrence model over our own users' watchlists and
+# liked recommendations, refreshed in batches by `flask update-cooccurrence`.
+# Recommenders use it as an HTTP-free candidate source and scoring signal.
+# Disabled unless COOCCURRENCE_PATH is set.
+COOCCURRENCE_PATH = os.environ.get("COOCCURRENCE_PATH")
+cooccurrence_model = cooccurrence.CooccurrenceModel(COOCCURRENCE_PATH) if COOCCURRENCE_PATH else None
+
+# Optional offline index of title/person neighborhoods, filled by
+# `flask crawl-index` (on the /data volume in production). Movie and TV
+# recommendations read it before going to TMDB, so titles the crawler has
+# covered cost no outbound calls at all. Disabled unless
+# NEIGHBORHOOD_INDEX_PATH is set.
+NEIGHBORHOOD_INDEX_PATH = os.environ.get("NEIGHBORHOOD_INDEX_PATH")
+neighborhood_index = neighborhood.NeighborhoodIndex(
+    NEIGHBORHOOD_INDEX_PATH,
+    max_age=int(os.environ.get("NEIGHBORHOOD_MAX_AGE_DAYS", "7")) * cache.DAY
+) if NEIGHBORHOOD_INDEX_PATH else None
+
+# In-memory text-similarity index over the titles and overviews in cached
+# responses (textsim.py): which titles read like a user's picks, as a scoring
+# signal for every content type and a candidate source for books. Bounded at
+# TEXT_INDEX_MAX_ITEMS titles per content type, per worker; 0 disables it.
+TEXT_INDEX_MAX_ITEMS = int(os.environ.get("TEXT_INDEX_MAX_ITEMS", "5000"))
+text_index = textsim.TextIndex(max_items=TEXT_INDEX_MAX_ITEMS) if TEXT_INDEX_MAX_ITEMS > 0 else None
+
+def cache_lookup(key):
+    """(value, fresh) from the memory tier, falling back to the disk tier."""
+    value, fresh = _cache.lookup(key)
+    if value is None and _disk_cache:
+        value, fresh_until, expires_at = _disk_cache.get(key)
+        if value is not None:
+            now = time.time()
+            _cache.set(key, value, fresh_until - now, stale_ttl=expires_at - now)
+            fresh = now <= fresh_until
+            if text_index:
+                text_index.add_response(key, value)
+    return value, fresh
 
 def cache_get(key):
-    entry = _cache.get(key)
-    if entry is None:
-        return None
-    value, expires_at = entry
-    if time.time() > expires_at:
-        del _cache[key]
-        return None
-    return value
-
-def cache_set(key, value, ttl_seconds):
-    if len(_cache) >= _CACHE_MAX_ENTRIES:
-        _cache.clear()
-    _cache[key] = (value, time.time() + ttl_seconds)
+    return cache_lookup(key)[0]
 
-def fetch_json_cached(url, params, cache_key, ttl_seconds=900, timeout=5):
+def cache_set(key, value, ttl_seconds=None):
+    """Store a response. Its lifetime comes from cache.TTL_POLICY unless
+    `ttl_seconds` is given, in which case it has no stale window."""
+    if ttl_seconds is None:
+        ttl_seconds, stale_ttl = cache.ttl_for(key)
+    else:
+        stale_ttl = ttl_seconds
+    _cache.set(key, value, ttl_seconds, stale_ttl=stale_ttl)
+    if _disk_cache:
+        _disk_cache.set(key, value, ttl_seconds, stale_ttl=stale_ttl)
+    if text_index:
+        text_index.add_response(key, value)
+
+# Concurrent misses for the same cache key share one outbound call.
+_inflight = outbound.SingleFlight()
+
+outbound_executor = outbound.OutboundExecutor(max_workers=OUTBOUND_CONCURRENCY)
+
+# Failed lookups are remembered briefly, and a TMDB / Google Books host that
+# keeps failing is cut off for a cooldown, so an upstream incident costs a
+# fast None rather than a full timeout per call; see outbound.UpstreamHealth.
+upstream_health = outbound.UpstreamHealth(
+    failure_threshold=int(os.environ.get("BREAKER_FAILURES", "5")),
+    cooldown_seconds=int(os.environ.get("BREAKER_COOLDOWN_SECONDS", "30")))
+
+# Client-side rate limits (requests/second) per upstream host, so a burst of
+# recommendation fan-outs is smoothed instead of drawing 429s. Both gunicorn
+# workers draw from the same buckets through small state files in
+# RATE_LIMIT_DIR; filler pages yield to searches and seed lookups.
+rate_limiter = outbound.RateLimiter({
+    urlsplit(TMDB_BASE_URL).hostname: float(os.environ.get("TMDB_RATE_LIMIT", "40")),
+    urlsplit(GOOGLE_BOOKS_BASE_URL).hostname: float(os.environ.get("BOOKS_RATE_LIMIT", "10")),
+}, state_dir=os.environ.get("RATE_LIMIT_DIR", tempfile.gettempdir()))
+
+# Per-namespace latency windows, and hedged requests: a call still
+# unanswered at its namespace's HEDGE_PERCENTILE latency is sent once more,
+# capped at HEDGE_BUDGET extra requests (0 disables hedging), and whichever
+# answer comes first is used. See outbound.Hedger.
+hedger = outbound.Hedger(budget=float(os.environ.get("HEDGE_BUDGET", "0.05")),
+                         percentile=float(os.environ.get("HEDGE_PERCENTILE", "95")),
+                         max_workers=OUTBOUND_CONCURRENCY, max_backups=HEDGE_WORKERS)
+
+# Overall latency budget for one recommendation call. The pipeline ranks
+# whatever candidates have arrived when it runs out, so p99 is bounded by
+# this rather than by the slowest upstream (whose own timeout is 5s).
+RECOMMEND_BUDGET_MS = int(os.environ.get("RECOMMEND_BUDGET_MS", "3000"))
+
+# Phase C scorer: "python" (default) scores candidates one by one; "numpy"
+# scores a whole pool in one vectorized pass (scoring.py), which pays off
+# once local candidate sources push pools into the thousands.
+SCORER = os.environ.get("SCORER", "python")
+if SCORER == "numpy" and not scoring.available():
+    print("WARNING: SCORER=numpy but NumPy is not installed. Using the Python scorer.")
+    SCORER = "python"
+
+# Which engine runs recommendation fan-out: "thread" (default) runs each
+# fetch on outbound_executor; "async" runs them as asyncio tasks over one
+# pooled httpx client (outbound.AsyncFetchEngine), which holds far more
+# requests in flight per worker for the same memory.
+FETCH_BACKEND = os.environ.get("FETCH_BACKEND", "thread")
+async_engine = None
+if FETCH_BACKEND == "async":
+    async_engine = outbound.AsyncFetchEngine(cache_lookup, cache_set, max_connections=OUTBOUND_CONCURRENCY,
+                                              health=upstream_health, rate_limiter=rate_limiter,
+                                              hedger=hedger)
+
+def fetch_json_cached(url, params, cache_key, ttl_seconds=None, timeout=5, deadline=None):
     """GET url (or return a cached response) as JSON, or None on failure.
 
-    Used for batches of calls fetched concurrently via ThreadPoolExecutor, so
+    Used for batches of calls fetched concurrently on outbound_executor, so
     the timeout is kept short - one slow/stuck call shouldn't drag the whole
     batch's wall-clock time up to a long timeout when the others finish fast.
+    Identical misses in flight at the same time (several users picking the
+    same popular titles) are coalesced into a single request, and a stale
+    cached response is returned immediately while a background refresh
+    replaces it.
+
+    A miss waits for a rate-limit token until `deadline` (time.monotonic();
+    `timeout` from now if not given) at most - see _fetch_with_token.
     """
-    data = cache_get(cache_key)
+    data, fresh = cache_lookup(cache_key)
     if data is not None:
+        if not fresh:
+            refresh_in_background(url, params, cache_key, ttl_seconds, timeout)
         return data
+    if deadline is None:
+        deadline = time.monotonic() + timeout
+    retry = functools.partial(fetch_json_cached, url, params, cache_key, ttl_seconds, timeout, deadline)
+    return _fetch_with_token(url, params, cache_key, ttl_seconds, timeout, deadline, retry)
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+_refresh_stats = {'started': 0}
+
+def refresh_in_background(url, params, cache_key, ttl_seconds, timeout):
+    """Re-fetch a stale entry on outbound_executor, at most once at a time per
+    key. A failed refresh leaves the stale copy in place until it expires."""
+    with _refreshing_lock:
+        if cache_key in _refreshing:
+            return
+        _refreshing.add(cache_key)
+        _refresh_stats['started'] += 1
+    deadline = time.monotonic() + timeout
+
+    def run():
+        retrying = False
+        try:
+            _fetch_with_token(url, params, cache_key, ttl_seconds, timeout, deadline, run)
+        except outbound.RetryAfter:
+            retrying = True   # the key stays claimed until the retry finishes
+            raise
+        finally:
+            if not retrying:
+                with _refreshing_lock:
+                    _refreshing.discard(cache_key)
+
+    outbound_executor.submit(run)
+
+def _fetch_with_token(url, params, cache_key, ttl_seconds, timeout, deadline, retry):
+    """Take a rate-limit token, then fetch the miss (coalesced per key).
+
+    Every priority may wait for its token until `deadline`, the lower ones
+    only for a shorter share of it (RateLimiter.WAIT_SHARE). The wait never
+    sleeps on a shared outbound_executor worker: a job there raises
+    outbound.RetryAfter and the executor runs `retry()` once the token is
+    due, leaving the worker to the jobs queued behind. Request threads just
+    sleep. A key someone else is already fetching needs no token of its own.
+    """
+    priority = outbound.priority_of(cache_key)
+    while not _inflight.running(cache_key):
+        wait = rate_limiter.poll(url, priority, deadline)
+        if wait is None:
+            return None
+        if not wait:
+            break
+        if outbound.deferrable():
+            raise outbound.RetryAfter(wait, retry)
+        time.sleep(wait)
+    return _inflight.do(cache_key, _fetch_and_cache, url, params, cache_key, ttl_seconds, timeout)
+
+def _fetch_and_cache(url, params, cache_key, ttl_seconds, timeout):
+    if not upstream_health.allow(url, cache_key):
+        return None
+    status = None
     try:
-        response = http.get(url, params=params, timeout=timeout)
+        response = hedger.call(cache.namespace_of(cache_key),
+                               lambda: http.get(url, params=params, timeout=timeout),
+                               can_hedge=lambda: not rate_limiter.try_acquire(url, priority=2))
+        status = response.status_code
         if response.ok:
-            data = response.json()
+            data = cache.project(cache_key, response.json())
             cache_set(cache_key, data, ttl_seconds)
             return data
-    except requests.RequestException:
+    except (requests.RequestException, ValueError):
         pass
+    finally:
+        upstream_health.record(url, cache_key, status)
     return None
 
-def get_or_create_user():
-    """Get or create a user based on session"""
-    if 'user_id' not in session:
-        session['user_id'] = str(uuid.uuid4())
+# Offline crawls leave live traffic alone: they take rate-limit tokens at the
+# lowest priority (and may wait for them), aren't hedged, and bypass both
+# response-cache tiers, so a crawl - possibly against a --base-url stub - never
+# puts its payloads under keys live users are served from.
+CRAWL_PRIORITY = len(outbound.RateLimiter.RESERVE) - 1
+
+def _crawl_fetch(url, params, cache_key, timeout=10, max_wait=60):
+    if not upstream_health.allow(url, cache_key):
+        return None
+    if not rate_limiter.acquire(url, CRAWL_PRIORITY, deadline=time.monotonic() + max_wait):
+        upstream_health.cancel(url)
+        return None
+    status = None
+    try:
+        response = http.get(url, params=params, timeout=timeout)
+        status = response.status_code
+        if response.ok:
+            return cache.project(cache_key, response.json())
+    except (requests.RequestException, ValueError):
+        pass
+    finally:
+        upstream_health.record(url, cache_key, status)
+    return None
 
-    # Try to find existing user by session ID
-    user = models.User.query.filter_by(session_id=session['user_id']).first()
+def _load_identity(session_id):
+    user = models.User.query.filter_by(session_id=session_id).first()
+    return identity.Identity.of(user) if user else None
+
+# Who each session is, cached per worker for IDENTITY_CACHE_TTL seconds so
+# API calls (and /api/me on every page load) don't each re-query the User row.
+identity_cache = identity.IdentityCache(
+    _load_identity,
+    max_sessions=int(os.environ.get("IDENTITY_CACHE_SESSIONS", "10000")),
+    ttl=float(os.environ.get("IDENTITY_CACHE_TTL", "60")))
+
+def current_user():
+    """The session's user as an identity.Identity, or identity.GUEST if it
+    hasn't saved anything yet. Never writes to the database: read-only
+    routes use this.
+
+    A session id is still assigned on first sight (the frontend calls
+    /api/me on every page load), so writes that race each other later - a
+    watchlist add and a feedback click from a fresh tab - all name the
+    same guest. Once a row exists the cookie says so ('has_user'), so a
+    guest lookup another worker cached as missing is looked up again.
+    """
+    session_id = session.get('user_id')
+    if not session_id:
+        session['user_id'] = str(uuid.uuid4())
+        return identity.GUEST
+    google_id = session.get('google_id')
+    has_user = session.get('has_user', False) or google_id is not None
+    return identity_cache.get(session_id, google_id, has_user) or identity.GUEST
 
-    if not user:
-        # Create new user
-        user = models.User(session_id=session['user_id'])
-        db.session.add(user)
+def get_or_create_user():
+    """The session's user, creating the guest row on first write. The
+    create is an upsert on session_id, so concurrent first writes from one
+    session (in any worker) share a single row."""
+    user = current_user()
+    if user.id is None:
+        session_id = session['user_id']
+        insert = sqlite_insert if SQLITE else postgresql_insert
+        db.session.execute(insert(models.User).values(session_id=session_id, created_at=datetime.utcnow())
+                           .on_conflict_do_nothing(index_elements=['session_id']))
         db.session.commit()
-
+        user = identity.Identity.of(models.User.query.filter_by(session_id=session_id).one())
+        identity_cache.put(user, session.get('google_id'))
+        session['has_user'] = True
     return user
 
 def merge_users(source, target):
@@ -132,38 +424,127 @@ def merge_users(source, target):
     to an account that already exists: nothing they did as a guest is lost.
     Watchlist rows that would collide with an item already on the account
     (same content_type + id) are dropped rather than duplicated.
+
+    Everything happens in a fixed handful of set-based statements, so signing
+    in costs the same however long either user's history is: neither user's
+    rows are loaded into Python.
     """
-    existing_keys = {(item.content_type, item.tmdb_id) for item in target.watchlist}
-
-    # Drop guest rows that duplicate something already on the account.
-    for item in list(source.watchlist):
-        if (item.content_type, item.tmdb_id) in existing_keys:
-            db.session.delete(item)
-    db.session.flush()
-
-    # Re-parent the rest with bulk UPDATEs rather than by assigning to the ORM
-    # relationship: the guest's children cascade delete-orphan, so they must be
-    # detached at the SQL level and the stale in-memory collections expired
-    # before deleting the guest row - otherwise the cascade takes the
-    # re-parented rows down with it.
-    models.Watchlist.query.filter_by(user_id=source.id).update({'user_id': target.id})
-    models.Recommendation.query.filter_by(user_id=source.id).update({'user_id': target.id})
-    db.session.flush()
-    db.session.expire(source)
-
-    db.session.delete(source)
+    flush_recommendation_log()   # queued guest rows must be re-parented too
+    sessions = (source.session_id, target.session_id)
+    source_id, target_id = source.id, target.id
+
+    # Re-parent the guest's watchlist rows the account doesn't already have
+    # (an anti-join against the account's rows), then drop the duplicates left
+    # behind. Done at the SQL level rather than through the ORM relationships:
+    # those cascade delete-orphan and would load both users' collections.
+    on_account = db.aliased(models.Watchlist)
+    duplicate = (db.select(on_account.id)
+                 .where(on_account.user_id == target_id,
+                        on_account.content_type == models.Watchlist.content_type,
+                        on_account.tmdb_id == models.Watchlist.tmdb_id)
+                 .exists())
+    models.Watchlist.query.filter(models.Watchlist.user_id == source_id, ~duplicate).update(
+        {'user_id': target_id}, synchronize_session=False)
+    models.Watchlist.query.filter_by(user_id=source_id).delete(synchronize_session=False)
+    models.Recommendation.query.filter_by(user_id=source_id).update(
+        {'user_id': target_id}, synchronize_session=False)
+
+    db.session.expunge(source)
+    models.User.query.filter_by(id=source_id).delete(synchronize_session=False)
     db.session.commit()
+    exclusion_cache.forget(source.id)
+    exclusion_cache.forget(target.id)
+    for session_id in sessions:
+        identity_cache.forget(session_id)
+
+def _recommended_since(user_id, content_type, after_row_id):
+    """(row id, title id) for the user's Recommendation rows logged after
+    `after_row_id`: the id-only query behind exclusion_cache. Movie/TV ids
+    come back as ints, like the ids in TMDB responses."""
+    rows = (db.session.query(models.Recommendation.id, models.Recommendation.tmdb_id)
+            .filter(models.Recommendation.user_id == user_id,
+                    models.Recommendation.content_type == content_type,
+                    models.Recommendation.id > after_row_id)
+            .all())
+    if content_type == 'book':
+        return rows
+    return [(row_id, int(tmdb_id)) for row_id, tmdb_id in rows]
+
+# Ids each user has already been recommended, per content type, so a
+# recommendation call doesn't load their whole history to exclude it (see
+# exclusions.py). Holds EXCLUSION_CACHE_USERS users per worker; histories
+# longer than EXCLUSION_BLOOM_MIN ids are kept as Bloom filters (0 disables).
+exclusion_cache = exclusions.ExclusionCache(
+    _recommended_since,
+    max_users=int(os.environ.get("EXCLUSION_CACHE_USERS", "10000")),
+    bloom_threshold=int(os.environ.get("EXCLUSION_BLOOM_MIN", "5000")))
+
+def _write_recommendations(rows):
+    with app.app_context():
+        try:
+            db.session.execute(db.insert(models.Recommendation), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+# Optional write-behind for the Recommendation rows logging what was served
+# (WRITE_BEHIND=1): routes queue them and a background thread inserts them in
+# bulk every WRITE_BEHIND_INTERVAL_MS or WRITE_BEHIND_BATCH rows, so the
+# response never waits on a commit. Queued rows still count as exclusions
+# here, and feedback/merge paths flush them before reading. See writebehind.py.
+recommendation_log = writebehind.WriteBehind(
+    _write_recommendations,
+    max_rows=int(os.environ.get("WRITE_BEHIND_BATCH", "100")),
+    interval=int(os.environ.get("WRITE_BEHIND_INTERVAL_MS", "1000")) / 1000
+) if os.environ.get("WRITE_BEHIND") == "1" else None
+
+# Another worker can't see this one's queue, and the UI's auto-"another" may
+# land there before the flush. So served ids also ride in the signed session
+# cookie, as [content_type, id, served_at], until their batch has surely been
+# written, and every worker excludes them. Clients that drop cookies can still
+# be re-served a title within the flush interval.
+UNFLUSHED_SERVED_SECONDS = max(10.0, 5 * recommendation_log.interval) if recommendation_log else 0
+UNFLUSHED_SERVED_MAX = 100
+
+def _carry_unflushed(content_type, item_ids):
+    now = time.time()
+    served = [entry for entry in session.get('unflushed_served', [])
+              if entry[2] > now - UNFLUSHED_SERVED_SECONDS]
+    served += [[content_type, item_id, now] for item_id in item_ids]
+    session['unflushed_served'] = served[-UNFLUSHED_SERVED_MAX:]
+
+def flush_recommendation_log():
+    """Make queued Recommendation rows visible to the queries that follow."""
+    if recommendation_log:
+        recommendation_log.flush()
+
+def excluded_ids_for(user, content_type, picks):
+    """Ids to keep out of this user's recommendations: the picks plus every
+    title recommended to them before, including rows still queued for
+    write-behind here or (through the session) in another worker."""
+    excluded_ids = exclusion_cache.get(user.id, content_type)
+    if recommendation_log:
+        excluded_ids.update(
+            row['tmdb_id'] if content_type == 'book' else int(row['tmdb_id'])
+            for row in recommendation_log.pending()
+            if row['user_id'] == user.id and row['content_type'] == content_type)
+        excluded_ids.update(item_id for served_type, item_id, _ in session.get('unflushed_served', [])
+                            if served_type == content_type)
+    if content_type == 'book':
+        excluded_ids.update(str(p.get('id')) for p in picks if p.get('id'))
+    else:
+        excluded_ids.update(p.get('id') for p in picks if p.get('id'))
+    return excluded_ids
 
-def build_taste_profile(user, content_type, local_feedback=None, history=None):
+def build_taste_profile(user, content_type, local_feedback=None):
     """Combine a user's like/dislike history into signals the scorers can use.
 
     Signed-in users' feedback lives in the database; guests' feedback lives in
     their browser's localStorage and arrives with the request (we never store
     it server-side). Both are merged here so scoring works the same either way.
-
-    `history` is the user's prefetched Recommendation rows for this content
-    type; the recommendation routes already load them for exclusions, and
-    passing them in avoids a second round-trip to the remote database.
+    The database side is one narrow query: three columns of the user's 30
+    most recently rated recommendations.
 
     Returns liked/disliked genre weights plus the ids of liked titles, which
     callers use to pull "more like this" candidates.
@@ -171,16 +552,13 @@ def build_taste_profile(user, content_type, local_feedback=None, history=None):
     entries = []
 
     if user.google_id:
-        if history is not None:
-            rows = sorted((r for r in history if r.was_liked is not None),
-                          key=lambda r: r.recommended_at, reverse=True)[:30]
-        else:
-            rows = (models.Recommendation.query
-                    .filter(models.Recommendation.user_id == user.id,
-                            models.Recommendation.content_type == content_type,
-                            models.Recommendation.was_liked.isnot(None))
-                    .order_by(models.Recommendation.recommended_at.desc())
-                    .limit(30).all())
+        rows = (db.session.query(models.Recommendation.tmdb_id, models.Recommendation.was_liked,
+                                 models.Recommendation.genres)
+                .filter(models.Recommendation.user_id == user.id,
+                        models.Recommendation.content_type == content_type,
+                        models.Recommendation.was_liked.isnot(None))
+                .order_by(models.Recommendation.recommended_at.desc())
+                .limit(30).all())
         for row in rows:
             entries.append({
                 'id': row.tmdb_id,
@@ -227,11 +605,12 @@ def recommendation_feedback():
         if item_id is None or liked is None:
             return jsonify({'error': 'id and liked are required'}), 400
 
-        user = get_or_create_user()
+        user = current_user()
         if not user.google_id:
             # Guest: acknowledged, but intentionally not stored server-side.
             return jsonify({'success': True, 'stored': False})
 
+        flush_recommendation_log()
         rec = (models.Recommendation.query
                .filter_by(user_id=user.id, content_type=content_type, tmdb_id=str(item_id))
                .order_by(models.Recommendation.recommended_at.desc())
@@ -250,25 +629,45 @@ def recommendation_feedback():
 def sync_feedback():
     """Merge a guest's localStorage feedback into their account after sign-in."""
     try:
-        user = get_or_create_user()
+        user = current_user()
         if not user.google_id:
             return jsonify({'success': False, 'error': 'Not signed in'}), 401
 
         data = request.get_json() or {}
-        entries = data.get('feedback') or []
+        # (content_type, id) -> liked; the first entry for a title wins.
+        wanted = {}
+        for entry in data.get('feedback') or []:
+            if isinstance(entry, dict) and entry.get('liked') is not None:
+                wanted.setdefault((entry.get('content_type', 'movie'), str(entry.get('id', ''))),
+                                  bool(entry['liked']))
+        if not wanted:
+            return jsonify({'success': True, 'applied': 0})
+
+        flush_recommendation_log()
+        # One query for the latest row of every title in the payload...
+        Rec = models.Recommendation
+        ranked = (db.select(Rec.id, Rec.content_type, Rec.tmdb_id, Rec.was_liked,
+                            db.func.row_number().over(
+                                partition_by=(Rec.content_type, Rec.tmdb_id),
+                                order_by=(Rec.recommended_at.desc(), Rec.id.desc())).label('rank'))
+                  .where(Rec.user_id == user.id,
+                         Rec.content_type.in_(sorted({content_type for content_type, _ in wanted})),
+                         Rec.tmdb_id.in_(sorted({item_id for _, item_id in wanted})))
+                  .subquery())
+        latest = db.session.execute(
+            db.select(ranked.c.id, ranked.c.content_type, ranked.c.tmdb_id, ranked.c.was_liked)
+            .where(ranked.c.rank == 1)).all()
+
+        # ...then at most two UPDATEs: one per feedback value.
+        to_apply = {True: [], False: []}
+        for row_id, content_type, item_id, was_liked in latest:
+            if was_liked is None and (content_type, item_id) in wanted:
+                to_apply[wanted[(content_type, item_id)]].append(row_id)
         applied = 0
-        for entry in entries:
-            if not isinstance(entry, dict) or entry.get('liked') is None:
-                continue
-            rec = (models.Recommendation.query
-                   .filter_by(user_id=user.id,
-                              content_type=entry.get('content_type', 'movie'),
-                              tmdb_id=str(entry.get('id', '')))
-                   .order_by(models.Recommendation.recommended_at.desc())
-                   .first())
-            if rec and rec.was_liked is None:
-                rec.was_liked = bool(entry['liked'])
-                applied += 1
+        for liked, row_ids in to_apply.items():
+            if row_ids:
+                applied += (Rec.query.filter(Rec.id.in_(row_ids), Rec.was_liked.is_(None))
+                            .update({'was_liked': liked}, synchronize_session=False))
         db.session.commit()
         return jsonify({'success': True, 'applied': applied})
     except Exception as e:
@@ -280,7 +679,7 @@ def api_me():
     """Current session's identity, plus the OAuth client id the frontend
     needs to render the Google Sign-In button."""
     try:
-        user = get_or_create_user()
+        user = current_user()
         return jsonify({
             'signed_in': bool(user.google_id),
             'name': user.display_name,
@@ -312,24 +711,33 @@ def auth_google():
 
     try:
         google_id = idinfo['sub']
-        current = get_or_create_user()
+        guest = current_user()
+        current = db.session.get(models.User, guest.id) if guest.id else None
         account = models.User.query.filter_by(google_id=google_id).first()
 
-        if account is None:
+        if account is None and current is None:
+            # First sign-in, nothing saved as a guest: a fresh account.
+            account = models.User(session_id=session['user_id'], google_id=google_id)
+            db.session.add(account)
+        elif account is None:
             # First sign-in for this Google account: promote the current
             # session user (and everything they saved as a guest) in place.
             current.google_id = google_id
             account = current
-        elif account.id != current.id:
-            # Existing account: fold the guest session's data into it and
-            # point this session at the account.
+        elif current is not None and account.id != current.id:
+            # Existing account: fold the guest session's data into it.
             merge_users(current, account)
-            session['user_id'] = account.session_id
 
         account.email = idinfo.get('email')
         account.display_name = idinfo.get('name')
         account.avatar_url = idinfo.get('picture')
         db.session.commit()
+        # Point this session at the account. google_id rides in the signed
+        # cookie so every worker's identity cache sees the sign-in at once.
+        session['user_id'] = account.session_id
+        session['google_id'] = google_id
+        identity_cache.forget(account.session_id)
+        identity_cache.put(identity.Identity.of(account), google_id)
 
         return jsonify({
             'success': True,
@@ -344,9 +752,38 @@ def auth_google():
 @app.route('/auth/logout', methods=['POST'])
 def auth_logout():
     """Sign out: detach the session. The next request gets a fresh guest identity."""
+    if session.get('user_id'):
+        identity_cache.forget(session['user_id'])
     session.pop('user_id', None)
+    session.pop('google_id', None)
+    session.pop('has_user', None)
     return jsonify({'success': True})
 
+@app.route('/api/stats')
+def api_stats():
+    """Outbound cache, request-coalescing, upstream-health, rate-limit,
+    latency/hedging, executor, text-index, exclusion, identity,
+    candidate-pool and speculation counters for this worker process."""
+    return jsonify({
+        'cache': _cache.stats(),
+        'disk_cache': _disk_cache.stats() if _disk_cache else None,
+        'neighborhood_index': neighborhood_index.stats() if neighborhood_index else None,
+        'cooccurrence': cooccurrence_model.stats() if cooccurrence_model else None,
+        'text_index': text_index.stats() if text_index else None,
+        'exclusions': exclusion_cache.stats(),
+        'identity': identity_cache.stats(),
+        'write_behind': recommendation_log.stats() if recommendation_log else None,
+        'coalesced': _inflight.stats(),
+        'refreshes': dict(_refresh_stats, in_flight=len(_refreshing)),
+        'upstream': upstream_health.stats(),
+        'rate_limits': rate_limiter.stats(),
+        'latency': hedger.stats(),
+        'executor': outbound_executor.stats(),
+        'async_engine': async_engine.stats() if async_engine else None,
+        'pools': _pools.stats(),
+        'speculation': _speculation_snapshot()
+    })
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -371,8 +808,9 @@ def watchlist_page():
 def get_watchlist():
     """Get user's full watchlist across all content types"""
     try:
-        user = get_or_create_user()
-        watchlist_items = models.Watchlist.query.filter_by(user_id=user.id).order_by(models.Watchlist.added_at.desc()).all()
+        user = current_user()
+        watchlist_items = (models.Watchlist.query.filter_by(user_id=user.id)
+                           .order_by(models.Watchlist.added_at.desc()).all()) if user.id else []
 
         watchlist = []
         for item in watchlist_items:
@@ -404,9 +842,9 @@ def remove_from_watchlist():
         if not item_id:
             return jsonify({'error': 'Item ID is required'}), 400
 
-        user = get_or_create_user()
+        user = current_user()
         watchlist_item = models.Watchlist.query.filter_by(
-            user_id=user.id, content_type=content_type, tmdb_id=str(item_id)).first()
+            user_id=user.id, content_type=content_type, tmdb_id=str(item_id)).first() if user.id else None
 
         if not watchlist_item:
             return jsonify({'error': 'Item not found in watchlist'}), 404
@@ -422,8 +860,9 @@ def remove_from_watchlist():
 def download_watchlist_csv():
     """Download watchlist as CSV"""
     try:
-        user = get_or_create_user()
-        watchlist_items = models.Watchlist.query.filter_by(user_id=user.id).order_by(models.Watchlist.added_at.desc()).all()
+        user = current_user()
+        watchlist_items = (models.Watchlist.query.filter_by(user_id=user.id)
+                           .order_by(models.Watchlist.added_at.desc()).all()) if user.id else []
         
         import io
         import csv
@@ -508,18 +947,9 @@ def search_movie():
         return jsonify([])
 
     try:
-        cache_key = ('search_movie', query)
-        data = cache_get(cache_key)
-        if data is None:
-            url = f"{TMDB_BASE_URL}/search/movie"
-            params = {
-                'api_key': TMDB_API_KEY,
-                'query': query
-            }
-            response = http.get(url, params=params, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            cache_set(cache_key, data, ttl_seconds=600)
+        data = fetch_json_cached(f"{TMDB_BASE_URL}/search/movie",
+                                 {'api_key': TMDB_API_KEY, 'query': query},
+                                 ('search_movie', query)) or {}
 
         movies = []
         for movie in data.get('results', [])[:10]:
@@ -547,18 +977,9 @@ def search_tv():
         return jsonify([])
 
     try:
-        cache_key = ('search_tv', query)
-        data = cache_get(cache_key)
-        if data is None:
-            url = f"{TMDB_BASE_URL}/search/tv"
-            params = {
-                'api_key': TMDB_API_KEY,
-                'query': query
-            }
-            response = http.get(url, params=params, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            cache_set(cache_key, data, ttl_seconds=600)
+        data = fetch_json_cached(f"{TMDB_BASE_URL}/search/tv",
+                                 {'api_key': TMDB_API_KEY, 'query': query},
+                                 ('search_tv', query)) or {}
 
         tv_series = []
         for tv in data.get('results', [])[:10]:
@@ -587,18 +1008,9 @@ def get_movie_suggestions():
         return jsonify([])
 
     try:
-        cache_key = ('search_movie', query)
-        data = cache_get(cache_key)
-        if data is None:
-            url = f"{TMDB_BASE_URL}/search/movie"
-            params = {
-                'api_key': TMDB_API_KEY,
-                'query': query
-            }
-            response = http.get(url, params=params, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            cache_set(cache_key, data, ttl_seconds=600)
+        data = fetch_json_cached(f"{TMDB_BASE_URL}/search/movie",
+                                 {'api_key': TMDB_API_KEY, 'query': query},
+                                 ('search_movie', query)) or {}
 
         suggestions = []
         for movie in data.get('results', [])[:5]:
@@ -623,18 +1035,9 @@ def get_tv_suggestions():
         return jsonify([])
 
     try:
-        cache_key = ('search_tv', query)
-        data = cache_get(cache_key)
-        if data is None:
-            url = f"{TMDB_BASE_URL}/search/tv"
-            params = {
-                'api_key': TMDB_API_KEY,
-                'query': query
-            }
-            response = http.get(url, params=params, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            cache_set(cache_key, data, ttl_seconds=600)
+        data = fetch_json_cached(f"{TMDB_BASE_URL}/search/tv",
+                                 {'api_key': TMDB_API_KEY, 'query': query},
+                                 ('search_tv', query)) or {}
 
         suggestions = []
         for tv in data.get('results', [])[:5]:
@@ -686,81 +1089,181 @@ def get_book_suggestions():
 def fetch_google_books(query, excluded_ids, max_results=10, lang=None):
     """Fetch books from Google Books API, optionally restricted to a language"""
     try:
-        cache_key = ('google_books', query, max_results, lang)
-        data = cache_get(cache_key)
-        if data is None:
-            search_url = f"{GOOGLE_BOOKS_BASE_URL}/volumes"
-            params = {
-                'q': query,
-                'maxResults': max_results,
-                'key': GOOGLE_BOOKS_API_KEY
-            }
-            if lang:
-                params['langRestrict'] = lang
-            response = http.get(search_url, params=params, timeout=3)
-            response.raise_for_status()
-            data = response.json()
-            cache_set(cache_key, data, ttl_seconds=600)
-
-        books = []
-        if 'items' in data:
-            for item in data['items']:
-                volume_info = item.get('volumeInfo', {})
-                book_id = item.get('id', '')
-                
-                if book_id not in excluded_ids:
-                    book = {
-                        'id': book_id,
-                        'title': volume_info.get('title', 'Unknown Title'),
-                        'authors': volume_info.get('authors', ['Unknown Author']),
-                        'published_date': volume_info.get('publishedDate', ''),
-                        'overview': volume_info.get('description', '')[:500] if volume_info.get('description') else '',
-                        'categories': volume_info.get('categories', []),
-                        'poster_path': volume_info.get('imageLinks', {}).get('thumbnail', '').replace('http:', 'https:'),
-                        'vote_average': float(volume_info.get('averageRating', 0) or 0),
-                        'vote_count': int(volume_info.get('ratingsCount', 0) or 0),
-                        'page_count': int(volume_info.get('pageCount', 0) or 0),
-                        'language': volume_info.get('language', 'en'),
-                        'publisher': volume_info.get('publisher', ''),
-                        'subtitle': volume_info.get('subtitle', '')
-                    }
-                    books.append(book)
-        
-        return books
+        params = {
+            'q': query,
+            'maxResults': max_results,
+            'key': GOOGLE_BOOKS_API_KEY
+        }
+        if lang:
+            params['langRestrict'] = lang
+        data = fetch_books_json(f"{GOOGLE_BOOKS_BASE_URL}/volumes", params,
+                                ('google_books', query, max_results, lang))
+        return recommender.books_from_volumes(data, excluded_ids)
     except:
         return []
 
+def fetch_books_json(url, params, cache_key, deadline=None):
+    """fetch_json_cached with Google Books' shorter timeout."""
+    return fetch_json_cached(url, params, cache_key, timeout=3, deadline=deadline)
+
+def tmdb_ctx(deadline=None):
+    """Recommender ctx for TMDB, on whichever fetch backend is configured."""
+    if async_engine:
+        fetch = functools.partial(async_engine.fetch, deadline=deadline)
+        return {'fetch': fetch, 'executor': async_engine, 'deadline': deadline,
+                'tmdb_base': TMDB_BASE_URL, 'tmdb_key': TMDB_API_KEY, 'index': neighborhood_index,
+                'cooccurrence': cooccurrence_model, 'textsim': text_index, 'scorer': SCORER}
+    fetch = functools.partial(fetch_json_cached, deadline=deadline)
+    return {'fetch': fetch, 'executor': outbound_executor, 'deadline': deadline,
+            'tmdb_base': TMDB_BASE_URL, 'tmdb_key': TMDB_API_KEY, 'index': neighborhood_index,
+            'cooccurrence': cooccurrence_model, 'textsim': text_index, 'scorer': SCORER}
+
+def books_ctx(deadline=None):
+    """Recommender ctx for Google Books, on whichever fetch backend is configured."""
+    if async_engine:
+        fetch = functools.partial(async_engine.fetch, timeout=3, deadline=deadline)
+        return {'fetch': fetch, 'executor': async_engine, 'deadline': deadline,
+                'books_base': GOOGLE_BOOKS_BASE_URL, 'books_key': GOOGLE_BOOKS_API_KEY,
+                'cooccurrence': cooccurrence_model, 'textsim': text_index, 'scorer': SCORER}
+    fetch = functools.partial(fetch_books_json, deadline=deadline)
+    return {'fetch': fetch, 'executor': outbound_executor, 'deadline': deadline,
+            'books_base': GOOGLE_BOOKS_BASE_URL, 'books_key': GOOGLE_BOOKS_API_KEY,
+            'cooccurrence': cooccurrence_model, 'textsim': text_index, 'scorer': SCORER}
+
+# Scored candidate pools, kept per (content_type, user, pick set) so that
+# "another recommendation" re-samples the pool in milliseconds instead of
+# rerunning the whole fetch-and-score fan-out.
+POOL_TTL_SECONDS = int(os.environ.get("POOL_TTL_SECONDS", "900"))
+_pools = cache.ResponseCache(max_bytes=int(os.environ.get("POOL_CACHE_MAX_MB", "16")) * 1024 * 1024)
+POOL_BUILDERS = {'movie': recommender.movie_pool, 'tv': recommender.tv_pool, 'book': recommender.book_pool}
+
+def pooled_recommendation(content_type, user, picks, profile, excluded_ids, ctx):
+    """One recommendation for these picks, reusing the user's cached pool.
+
+    The pool is rebuilt only when missing or expired; otherwise the request's
+    exclusions and current feedback are re-applied to it (see
+    recommender.pick_from_pool).
+    """
+    pool = candidate_pool(content_type, user, picks, profile, excluded_ids, ctx)
+    return recommender.pick_from_pool(pool, profile, excluded_ids)
+
+def candidate_pool(content_type, user, picks, profile, excluded_ids, ctx):
+    """The user's cached scored pool for these picks, built if missing."""
+    pool_key = (content_type, user.id, tuple(sorted(str(p.get('id')) for p in picks)))
+    pool = _pools.get(pool_key)
+    if pool is None:
+        pool = POOL_BUILDERS[content_type](picks, profile, excluded_ids, ctx)
+        # Only complete pools are kept: one cut short by the deadline would
+        # leave the missing sources out of every follow-up. The late responses
+        # still land in the response cache, so the next rebuild is cheap.
+        if not pool['dropped']:
+            _pools.set(pool_key, pool, POOL_TTL_SECONDS)
+    return pool
+
+# Speculative precomputation: right after serving a recommendation, the next
+# one for the same picks (with the served title excluded) is computed in the
+# background, since users very often ask for another within seconds - the UI
+# even does so automatically after a dislike. It runs on one dedicated thread
+# and is skipped whenever real work is queued for the outbound executor, so
+# idle speculation never competes with live requests. The speculated pool is
+# kept with the pick, so a request whose feedback has changed since - a
+# dislike, typically - is re-ranked from it rather than rebuilt.
+SPECULATION_TTL_SECONDS = 300
+_speculative = cache.ResponseCache(max_bytes=int(os.environ.get("POOL_CACHE_MAX_MB", "16")) * 1024 * 1024)
+_speculation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='speculate')
+_speculation_busy = threading.Lock()
+_speculation_lock = threading.Lock()
+_speculation_stats = {'started': 0, 'skipped': 0, 'served': 0, 'reranked': 0}
+
+def _count_speculation(field):
+    with _speculation_lock:
+        _speculation_stats[field] += 1
+
+def _speculation_snapshot():
+    with _speculation_lock:
+        return dict(_speculation_stats)
+
+def speculative_recommendation(content_type, user, picks, profile, excluded_ids):
+    """The precomputed next recommendation: as computed if this request's
+    exclusions and taste profile are the ones it was computed for, else
+    re-picked from the speculated pool with the current ones. None if
+    nothing was speculated."""
+    slot_key = (content_type, user.id, tuple(sorted(str(p.get('id')) for p in picks)))
+    slot = _speculative.pop(slot_key)
+    if slot is None:
+        return None
+    if slot['excluded_ids'] == excluded_ids and slot['profile'] == profile:
+        _count_speculation('served')
+        return slot['recommendation']
+    _count_speculation('reranked')
+    return recommender.pick_from_pool(slot['pool'], profile, excluded_ids)
+
+def speculate_next(content_type, user, picks, profile, excluded_ids):
+    """Start computing the recommendation that should follow this one.
+
+    `excluded_ids` must already include the title just served. Does nothing
+    if a speculation is already running or outbound work is queued.
+    """
+    engine = async_engine or outbound_executor
+    if engine.queue_depth or not _speculation_busy.acquire(blocking=False):
+        _count_speculation('skipped')
+        return
+    _count_speculation('started')
+    slot_key = (content_type, user.id, tuple(sorted(str(p.get('id')) for p in picks)))
+
+    def run():
+        try:
+            ctx = books_ctx(recommendation_deadline({})) if content_type == 'book' else tmdb_ctx(recommendation_deadline({}))
+            pool = candidate_pool(content_type, user, picks, profile, excluded_ids, ctx)
+            recommendation = recommender.pick_from_pool(pool, profile, excluded_ids)
+            if recommendation:
+                _speculative.set(slot_key, {'excluded_ids': excluded_ids, 'profile': profile, 'pool': pool,
+                                            'recommendation': recommendation}, SPECULATION_TTL_SECONDS)
+        except Exception as e:
+            print(f"Speculative recommendation failed: {e}")
+        finally:
+            _speculation_busy.release()
+
+    _speculation_executor.submit(run)
+
+def recommendation_deadline(data):
+    """time.monotonic() deadline for one recommendation call.
+
+    Starts from RECOMMEND_BUDGET_MS; clients may ask for a different budget
+    with "budget_ms" in the request body, clamped to a sane range. Sources
+    that haven't answered by then are dropped and ranking uses the rest.
+    """
+    try:
+        budget_ms = int(data.get('budget_ms') or RECOMMEND_BUDGET_MS)
+    except (TypeError, ValueError):
+        budget_ms = RECOMMEND_BUDGET_MS
+    budget_ms = min(max(budget_ms, 250), 10000)
+    return time.monotonic() + budget_ms / 1000
+
 @app.route('/get_book_recommendation', methods=['POST'])
 def get_book_recommendation():
     """Get a book recommendation"""
     try:
         data = request.get_json()
+        deadline = recommendation_deadline(data)
         user_books = data.get('books', [])
         if not user_books or len(user_books) < 3:
             return jsonify({'error': 'Please provide at least 3 books'}), 400
 
         user = get_or_create_user()
-        previous_recommendations = models.Recommendation.query.filter_by(user_id=user.id, content_type='book').all()
-        profile = build_taste_profile(user, 'book', data.get('feedback'), history=previous_recommendations)
-
-        excluded_ids = {str(b.get('id')) for b in user_books if b.get('id')}
-        excluded_ids.update(rec.tmdb_id for rec in previous_recommendations)
+        profile = build_taste_profile(user, 'book', data.get('feedback'))
+        excluded_ids = excluded_ids_for(user, 'book', user_books)
 
-        recommendation = recommender.recommend_book(
-            user_books, profile, excluded_ids, {'fetch_books': fetch_google_books})
+        recommendation = speculative_recommendation('book', user, user_books, profile, excluded_ids)
+        if recommendation is None:
+            recommendation = pooled_recommendation(
+                'book', user, user_books, profile, excluded_ids, books_ctx(deadline))
         if not recommendation:
             return jsonify({'error': 'No suitable recommendations found'}), 404
 
-        try:
-            db.session.add(models.Recommendation(
-                user_id=user.id, content_type='book', tmdb_id=str(recommendation.get('id', '')),
-                title=recommendation.get('title', ''), release_date=recommendation.get('published_date', ''),
-                poster_path=recommendation.get('poster_path', ''), overview=recommendation.get('overview', ''),
-                vote_average=recommendation.get('vote_average', 0), genres=recommendation.get('categories', [])))
-            db.session.commit()
-        except Exception:
-            db.session.rollback()
+        log_recommendations(user, 'book', [recommendation])
 
+        speculate_next('book', user, user_books, profile, excluded_ids | {str(recommendation.get('id', ''))})
         return jsonify({'recommendation': recommendation})
     except Exception as e:
         return jsonify({'error': f'Failed to get recommendation: {str(e)}'}), 500
@@ -770,33 +1273,25 @@ def get_movie_recommendation():
     """Get a movie recommendation"""
     try:
         data = request.get_json()
+        deadline = recommendation_deadline(data)
         user_movies = data.get('movies', [])
         if not user_movies or len(user_movies) < 3:
             return jsonify({'error': 'Please provide at least 3 movies'}), 400
 
         user = get_or_create_user()
-        previous_recommendations = models.Recommendation.query.filter_by(user_id=user.id, content_type='movie').all()
-        profile = build_taste_profile(user, 'movie', data.get('feedback'), history=previous_recommendations)
+        profile = build_taste_profile(user, 'movie', data.get('feedback'))
+        excluded_ids = excluded_ids_for(user, 'movie', user_movies)
 
-        excluded_ids = {m.get('id') for m in user_movies if m.get('id')}
-        excluded_ids.update(int(rec.tmdb_id) for rec in previous_recommendations)
-
-        recommendation = recommender.recommend_movie(
-            user_movies, profile, excluded_ids,
-            {'fetch': fetch_json_cached, 'tmdb_base': TMDB_BASE_URL, 'tmdb_key': TMDB_API_KEY})
+        recommendation = speculative_recommendation('movie', user, user_movies, profile, excluded_ids)
+        if recommendation is None:
+            recommendation = pooled_recommendation(
+                'movie', user, user_movies, profile, excluded_ids, tmdb_ctx(deadline))
         if not recommendation:
             return jsonify({'error': 'No suitable recommendations found'}), 404
 
-        try:
-            db.session.add(models.Recommendation(
-                user_id=user.id, content_type='movie', tmdb_id=str(recommendation.get('id')),
-                title=recommendation.get('title', ''), release_date=recommendation.get('release_date', ''),
-                poster_path=recommendation.get('poster_path', ''), overview=recommendation.get('overview', ''),
-                vote_average=recommendation.get('vote_average', 0), genres=recommendation.get('genre_ids', [])))
-            db.session.commit()
-        except Exception:
-            db.session.rollback()
+        log_recommendations(user, 'movie', [recommendation])
 
+        speculate_next('movie', user, user_movies, profile, excluded_ids | {recommendation.get('id')})
         return jsonify({'recommendation': recommendation})
     except Exception as e:
         return jsonify({'error': f'Failed to get recommendation: {str(e)}'}), 500
@@ -806,36 +1301,144 @@ def get_tv_recommendation():
     """Get a TV series recommendation"""
     try:
         data = request.get_json()
+        deadline = recommendation_deadline(data)
         user_tv_series = data.get('tv_series', [])
         if not user_tv_series or len(user_tv_series) < 3:
             return jsonify({'error': 'Please provide at least 3 TV series'}), 400
 
         user = get_or_create_user()
-        previous_recommendations = models.Recommendation.query.filter_by(user_id=user.id, content_type='tv').all()
-        profile = build_taste_profile(user, 'tv', data.get('feedback'), history=previous_recommendations)
-
-        excluded_ids = {s.get('id') for s in user_tv_series if s.get('id')}
-        excluded_ids.update(int(rec.tmdb_id) for rec in previous_recommendations)
+        profile = build_taste_profile(user, 'tv', data.get('feedback'))
+        excluded_ids = excluded_ids_for(user, 'tv', user_tv_series)
 
-        recommendation = recommender.recommend_tv(
-            user_tv_series, profile, excluded_ids,
-            {'fetch': fetch_json_cached, 'tmdb_base': TMDB_BASE_URL, 'tmdb_key': TMDB_API_KEY})
+        recommendation = speculative_recommendation('tv', user, user_tv_series, profile, excluded_ids)
+        if recommendation is None:
+            recommendation = pooled_recommendation(
+                'tv', user, user_tv_series, profile, excluded_ids, tmdb_ctx(deadline))
         if not recommendation:
             return jsonify({'error': 'No suitable recommendations found'}), 404
 
+        log_recommendations(user, 'tv', [recommendation])
+
+        speculate_next('tv', user, user_tv_series, profile, excluded_ids | {recommendation.get('id')})
+        return jsonify({'recommendation': recommendation})
+    except Exception as e:
+        return jsonify({'error': f'Failed to get recommendation: {str(e)}'}), 500
+
+# Request body key, display noun and the recommendation fields stored as
+# title/release date/genres, per content type.
+BATCH_CONTENT_TYPES = {
+    'movie': ('movies', 'movies', 'title', 'release_date', 'genre_ids'),
+    'tv': ('tv_series', 'TV series', 'name', 'first_air_date', 'genre_ids'),
+    'book': ('books', 'books', 'title', 'published_date', 'categories'),
+}
+MAX_BATCH_SIZE = 20
+
+def log_recommendations(user, content_type, recommendations):
+    """Record served recommendations in the user's history, in one bulk
+    INSERT - or queued for write-behind when it's on - and in their cached
+    exclusion set. A failed insert only loses history, never the response."""
+    _, _, title_field, date_field, genres_field = BATCH_CONTENT_TYPES[content_type]
+    now = datetime.utcnow()
+    rows = [{
+        'user_id': user.id, 'content_type': content_type, 'tmdb_id': str(rec.get('id', '')),
+        'title': rec.get(title_field, ''), 'release_date': rec.get(date_field, ''),
+        'poster_path': rec.get('poster_path', ''), 'overview': rec.get('overview', ''),
+        'vote_average': rec.get('vote_average', 0), 'genres': rec.get(genres_field, []), 'recommended_at': now
+    } for rec in recommendations]
+    served_ids = [row['tmdb_id'] if content_type == 'book' else rec.get('id')
+                  for row, rec in zip(rows, recommendations)]
+    if recommendation_log:
+        recommendation_log.put(rows)
+        _carry_unflushed(content_type, served_ids)
+    else:
         try:
-            db.session.add(models.Recommendation(
-                user_id=user.id, content_type='tv', tmdb_id=str(recommendation.get('id')),
-                title=recommendation.get('name', ''), release_date=recommendation.get('first_air_date', ''),
-                poster_path=recommendation.get('poster_path', ''), overview=recommendation.get('overview', ''),
-                vote_average=recommendation.get('vote_average', 0), genres=recommendation.get('genre_ids', [])))
+            db.session.execute(db.insert(models.Recommendation), rows)
             db.session.commit()
         except Exception:
             db.session.rollback()
+            return
+    exclusion_cache.note(user.id, content_type, served_ids)
 
-        return jsonify({'recommendation': recommendation})
+def batch_recommendations(content_type):
+    """Top-K variant of the /get_*_recommendation routes.
+
+    Runs the pipeline once (or reuses the cached pool) and returns up to
+    "count" diverse candidates with scores and reasoning, so a client can
+    page through them locally instead of coming back once per title. All
+    of them are logged as recommendations in a single bulk INSERT.
+    """
+    picks_key, noun = BATCH_CONTENT_TYPES[content_type][:2]
+    try:
+        data = request.get_json()
+        deadline = recommendation_deadline(data)
+        picks = data.get(picks_key, [])
+        if not picks or len(picks) < 3:
+            return jsonify({'error': f'Please provide at least 3 {noun}'}), 400
+        try:
+            count = min(max(int(data.get('count') or 10), 1), MAX_BATCH_SIZE)
+        except (TypeError, ValueError):
+            count = 10
+
+        user = get_or_create_user()
+        profile = build_taste_profile(user, content_type, data.get('feedback'))
+        excluded_ids = excluded_ids_for(user, content_type, picks)
+
+        ctx = books_ctx(deadline) if content_type == 'book' else tmdb_ctx(deadline)
+        pool = candidate_pool(content_type, user, picks, profile, excluded_ids, ctx)
+        recommendations = recommender.top_from_pool(pool, profile, excluded_ids, count)
+        if not recommendations:
+            return jsonify({'error': 'No suitable recommendations found'}), 404
+
+        log_recommendations(user, content_type, recommendations)
+
+        return jsonify({'recommendations': recommendations, 'dropped_sources': pool['dropped']})
     except Exception as e:
-        return jsonify({'error': f'Failed to get recommendation: {str(e)}'}), 500
+        return jsonify({'error': f'Failed to get recommendations: {str(e)}'}), 500
+
+@app.route('/get_movie_recommendations', methods=['POST'])
+def get_movie_recommendations():
+    """Get the top movie recommendations in one call"""
+    return batch_recommendations('movie')
+
+@app.route('/get_tv_recommendations', methods=['POST'])
+def get_tv_recommendations():
+    """Get the top TV series recommendations in one call"""
+    return batch_recommendations('tv')
+
+@app.route('/get_book_recommendations', methods=['POST'])
+def get_book_recommendations():
+    """Get the top book recommendations in one call"""
+    return batch_recommendations('book')
+
+@app.cli.command("upgrade-db")
+def upgrade_db():
+    """Bring an existing database up to models.py: missing tables and indexes.
+
+    db.create_all() at startup creates missing tables (with their indexes)
+    but never alters one that exists, so indexes added to models.py later
+    only reach existing databases through this command. Safe to re-run:
+    anything already present is skipped. On Postgres each index is built
+    CONCURRENTLY, outside a transaction, so the app keeps writing meanwhile;
+    if a build fails, drop the invalid index it leaves and re-run.
+    """
+    db.create_all()
+    postgres = db.engine.dialect.name == "postgresql"
+    existing = inspect(db.engine)
+    created = 0
+    for table in db.metadata.sorted_tables:
+        present = {index["name"] for index in existing.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name in present:
+                continue
+            print(f"Creating index {index.name} on {table.name}...")
+            if postgres:
+                index.dialect_options["postgresql"]["concurrently"] = True
+                with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                    index.create(conn)
+            else:
+                index.create(db.engine)
+            created += 1
+    print(f"Created {created} index(es); schema is up to date.")
 
 @app.cli.command("cleanup-users")
 def cleanup_users():
@@ -853,5 +1456,96 @@ def cleanup_users():
     db.session.commit()
     print(f"Deleted {count} user(s) created before {cutoff.isoformat()}.")
 
+@app.cli.command("crawl-index")
+@click.option("--pages", default=5, show_default=True, help="Pages of TMDB's popular movies and TV to seed from.")
+@click.option("--days", default=30, show_default=True,
+              help="Also seed from titles recommended or watchlisted in this many days.")
+@click.option("--refresh-after-hours", default=24, show_default=True,
+              help="Skip entries crawled more recently than this.")
+@click.option("--base-url", default=None, help="TMDB API base URL (e.g. a local stub server).")
+def crawl_index(pages, days, refresh_after_hours, base_url):
+    """Crawl title and person neighborhoods into NEIGHBORHOOD_INDEX_PATH.
+
+    Seeds are TMDB's popular movies and TV plus titles users have recently
+    been recommended or saved. For each: its credits or series details, its
+    TMDB recommendations, and its director's or creator's works. Run
+    periodically (e.g. nightly, via a scheduled job on your host); a re-run
+    only refetches entries older than --refresh-after-hours.
+    """
+    if neighborhood_index is None:
+        raise click.ClickException("NEIGHBORHOOD_INDEX_PATH is not set.")
+    base = base_url or TMDB_BASE_URL
+
+    seeds = {'movie': set(), 'tv': set()}
+    for content_type in seeds:
+        for page in range(1, pages + 1):
+            data = _crawl_fetch(f"{base}/{content_type}/popular", {'api_key': TMDB_API_KEY, 'page': page},
+                                (f'popular_{content_type}', page)) or {}
+            seeds[content_type].update(item['id'] for item in data.get('results', []) if item.get('id'))
+
+    since = datetime.utcnow() - timedelta(days=days)
+    recent = db.session.query(models.Recommendation.content_type, models.Recommendation.tmdb_id).filter(
+        models.Recommendation.recommended_at >= since).union(
+        db.session.query(models.Watchlist.content_type, models.Watchlist.tmdb_id).filter(
+            models.Watchlist.added_at >= since))
+    for content_type, tmdb_id in recent:
+        if content_type in seeds and str(tmdb_id).isdigit():
+            seeds[content_type].add(int(tmdb_id))
+
+    counts = neighborhood.crawl(neighborhood_index, _crawl_fetch, base, TMDB_API_KEY, outbound_executor,
+                                movie_ids=seeds['movie'], tv_ids=seeds['tv'],
+                                refresh_after=refresh_after_hours * 3600)
+    print(f"Crawled {len(seeds['movie'])} movie and {len(seeds['tv'])} TV seed(s): "
+          f"{counts['stored']} stored, {counts['skipped']} fresh, {counts['failed']} failed.")
+
+@app.cli.command("update-cooccurrence")
+@click.option("--batch-size", default=2000, show_default=True, help="Rows read and committed per batch.")
+@click.option("--like-days", default=30, show_default=True,
+              help="Re-read likes on recommendations made in this many days.")
+@click.option("--reread-ids", default=1000, show_default=True,
+              help="Re-read this many watchlist ids below the high-water mark.")
+def update_cooccurrence(batch_size, like_days, reread_ids):
+    """Fold new watchlist saves and liked recommendations into COOCCURRENCE_PATH.
+
+    Watchlist rows are read past a high-water mark, less `reread_ids`: ids
+    don't commit in order (see exclusions.py), so a save can land below the
+    mark after a run has passed it. Likes are set on rows some time after
+    they're inserted, so recent liked rows are re-read each run. Either way,
+    events the model has already counted are skipped. Rows are streamed
+    and committed in batches, so memory stays flat however large the tables
+    are. Run periodically (e.g. hourly) rather than on every write.
+    """
+    if cooccurrence_model is None:
+        raise click.ClickException("COOCCURRENCE_PATH is not set.")
+
+    def events(rows):
+        for row in rows:
+            if row.content_type != 'book' and not str(row.tmdb_id).isdigit():
+                continue
+            record = cooccurrence.item_record(row.content_type, row.tmdb_id, row.title, row.release_date,
+                                              row.poster_path, row.overview, row.vote_average, row.genres,
+                                              getattr(row, 'authors', None))
+            yield row.user_id, row.content_type, row.tmdb_id, record
+
+    def fold(query, high_water=None):
+        added, batch = 0, []
+        for row in query.yield_per(batch_size):
+            batch.append(row)
+            if len(batch) == batch_size:
+                added += cooccurrence_model.add_events(events(batch), high_water and (high_water, batch[-1].id))
+                batch = []
+        if batch:
+            added += cooccurrence_model.add_events(events(batch), high_water and (high_water, batch[-1].id))
+        return added
+
+    saved = fold(models.Watchlist.query
+                 .filter(models.Watchlist.id > cooccurrence_model.high_water('watchlist') - reread_ids)
+                 .order_by(models.Watchlist.id), high_water='watchlist')
+    liked = fold(models.Recommendation.query
+                 .filter(models.Recommendation.was_liked.is_(True),
+                         models.Recommendation.recommended_at >= datetime.utcnow() - timedelta(days=like_days))
+                 .order_by(models.Recommendation.id))
+    print(f"Added {saved} watchlist save(s) and {liked} like(s) to the co-occurrence model.")
+
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=5000)
\ No newline at end of file
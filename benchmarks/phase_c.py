@@ -0,0 +1,86 @@
+"""Phase C scoring: per-item Python loop vs the vectorized NumPy scorer.
+
+Builds synthetic movie pools of several sizes, scores each both ways
+(recommender._phase_c_scores, then the pick-time feedback term via
+recommender._totals), checks the two agree to within --tolerance, and prints
+the timings.
+
+    python benchmarks/phase_c.py
+    python benchmarks/phase_c.py --sizes 500 5000 50000 --repeat 5
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import recommender  # noqa: E402
+import scoring  # noqa: E402
+
+GENRES = list(recommender.MOVIE_GENRES)
+
+
+def synthetic_pool(size, rng):
+    entries, affinity, home = [], [], []
+    for i in range(size):
+        genres = rng.sample(GENRES, rng.randint(1, 4))
+        entries.append({
+            'item': {'id': i, 'vote_average': rng.uniform(6, 9.5), 'vote_count': rng.randint(30, 40000),
+                     'original_language': rng.choice(['en', 'en', 'en', 'ko', 'fr'])},
+            'genres': genres,
+            'similar_sources': set(range(rng.choice([0, 0, 1, 2, 5]))),
+            'cooccurrence': rng.choice([0.0, 0.0, 0.0, rng.random()]),
+            'text': rng.choice([0.0, 0.0, rng.random() / 2]),
+        })
+        affinity.append(rng.choice([0, 0, 0, 0, 1, 2]))
+        home.append(entries[-1]['item']['original_language'] == 'ko')
+    genre_counts = {g: rng.randint(1, 4) for g in rng.sample(GENRES, 5)}
+    profile = {'liked_genres': {g: rng.randint(1, 3) for g in rng.sample(GENRES, 4)},
+               'disliked_genres': {g: rng.randint(1, 3) for g in rng.sample(GENRES, 3)},
+               'liked_ids': []}
+    return entries, affinity, home, genre_counts, profile
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 2000, 20000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    args = parser.parse_args()
+
+    if not scoring.available():
+        sys.exit('NumPy is not installed; pip install numpy to run this benchmark.')
+
+    rng = random.Random(42)
+    print(f"{'candidates':>10}  {'python ms':>10}  {'numpy ms':>10}  {'speedup':>8}  {'max diff':>9}")
+    for size in args.sizes:
+        entries, affinity, home, genre_counts, profile = synthetic_pool(size, rng)
+
+        def run(scorer):
+            scored, vectors = recommender._phase_c_scores(entries, affinity, home, genre_counts, {'scorer': scorer})
+            pool = {'scored': scored, 'vectors': vectors}
+            return recommender._totals(pool, profile, set())
+
+        python_totals, python_time = timed(lambda: run(None), args.repeat)
+        numpy_totals, numpy_time = timed(lambda: run('numpy'), args.repeat)
+        diff = max((abs(a[1] - b[1]) for a, b in zip(python_totals, numpy_totals)), default=0.0)
+        if diff > args.tolerance:
+            sys.exit(f'Scores diverge at {size} candidates: max difference {diff}')
+        print(f'{size:>10}  {1000 * python_time:>10.2f}  {1000 * numpy_time:>10.2f}  '
+              f'{python_time / numpy_time:>7.1f}x  {diff:>9.1e}')
+
+
+if __name__ == '__main__':
+    main()
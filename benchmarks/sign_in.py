@@ -0,0 +1,153 @@
+"""Sign-in for heavy users: per-row sync_feedback/merge_users vs set-based.
+
+Seeds a scratch SQLite database with an account holding --rows history rows
+(and a watchlist a tenth that size) plus a guest with a short history,
+feedback and a watchlist that partly overlaps the account's. Then times the
+two sign-in steps the old way (one query per feedback entry, the account's
+whole watchlist loaded to find duplicates) and through app.py's current
+code, counting the SQL statements each runs and checking both leave the
+database in the same state.
+
+    python benchmarks/sign_in.py
+    python benchmarks/sign_in.py --rows 1000 10000 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FEEDBACK = 30   # per content type: the frontend's localStorage cap
+TYPES = ('movie', 'tv', 'book')
+
+
+def seed(app, models, rows, rng):
+    db = app.db
+    db.drop_all()
+    db.create_all()
+    db.session.execute(db.insert(models.User), [
+        {'id': 1, 'session_id': 'account', 'google_id': 'g-account'},
+        {'id': 2, 'session_id': 'guest'}])
+    # Distinct timestamps, so "latest row for a title" is the same either way.
+    start = datetime(2024, 1, 1)
+    history = [{'user_id': 1, 'content_type': rng.choice(TYPES), 'tmdb_id': str(rng.randint(1, rows)),
+                'title': f'Title {i}', 'overview': 'x' * 300, 'genres': [28, 18],
+                'recommended_at': start + timedelta(seconds=i)} for i in range(rows)]
+    history += [{'user_id': 2, 'content_type': content_type, 'tmdb_id': str(i), 'title': f'Guest {i}',
+                 'recommended_at': start + timedelta(seconds=rows + i)}
+                for content_type in TYPES for i in range(1, 101)]
+    db.session.execute(db.insert(models.Recommendation), history)
+    watchlist = [{'user_id': 1, 'content_type': 'movie', 'tmdb_id': str(i), 'title': f'Title {i}'}
+                 for i in range(max(1, rows // 10))]
+    watchlist += [{'user_id': 2, 'content_type': 'movie', 'tmdb_id': str(i), 'title': f'Guest {i}'}
+                  for i in range(0, 100, 2)]
+    db.session.execute(db.insert(models.Watchlist), watchlist)
+    db.session.commit()
+    return [{'content_type': content_type, 'id': str(rng.randint(1, rows)), 'liked': rng.random() < 0.7}
+            for content_type in TYPES for _ in range(FEEDBACK)]
+
+
+def legacy_sync_feedback(app, models, user_id, entries):
+    applied = 0
+    for entry in entries:
+        rec = (models.Recommendation.query
+               .filter_by(user_id=user_id, content_type=entry['content_type'], tmdb_id=entry['id'])
+               .order_by(models.Recommendation.recommended_at.desc())
+               .first())
+        if rec and rec.was_liked is None:
+            rec.was_liked = entry['liked']
+            applied += 1
+    app.db.session.commit()
+    return applied
+
+
+def legacy_merge_users(app, models, source, target):
+    db = app.db
+    existing_keys = {(item.content_type, item.tmdb_id) for item in target.watchlist}
+    for item in list(source.watchlist):
+        if (item.content_type, item.tmdb_id) in existing_keys:
+            db.session.delete(item)
+    db.session.flush()
+    models.Watchlist.query.filter_by(user_id=source.id).update({'user_id': target.id})
+    models.Recommendation.query.filter_by(user_id=source.id).update({'user_id': target.id})
+    db.session.flush()
+    db.session.expire(source)
+    db.session.delete(source)
+    db.session.commit()
+
+
+def snapshot(app, models):
+    db = app.db
+    return (sorted(db.session.query(models.Watchlist.user_id, models.Watchlist.content_type,
+                                    models.Watchlist.tmdb_id).all()),
+            sorted(db.session.query(models.Recommendation.id, models.Recommendation.user_id,
+                                    models.Recommendation.was_liked).all()),
+            sorted(db.session.query(models.User.id).all()))
+
+
+def run(app, models, rows, legacy, statements):
+    """Seeds, signs the guest in, returns (sync s, merge s, sync stmts, merge stmts, state)."""
+    entries = seed(app, models, rows, random.Random(rows))
+    app.db.session.expire_all()
+    app.exclusion_cache.forget(1)
+
+    statements.clear()
+    started = time.perf_counter()
+    if legacy:
+        legacy_sync_feedback(app, models, 1, entries)
+    else:
+        client = app.app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'], session['google_id'] = 'account', 'g-account'
+        response = client.post('/api/sync_feedback', json={'feedback': entries})
+        assert response.status_code == 200, response.get_json()
+    sync_time, sync_count = time.perf_counter() - started, len(statements)
+
+    source, target = app.db.session.get(models.User, 2), app.db.session.get(models.User, 1)
+    statements.clear()
+    started = time.perf_counter()
+    if legacy:
+        legacy_merge_users(app, models, source, target)
+    else:
+        app.merge_users(source, target)
+    merge_time, merge_count = time.perf_counter() - started, len(statements)
+    return sync_time, merge_time, sync_count, merge_count, snapshot(app, models)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='sign-in-bench-')
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    import app
+    import models
+    from sqlalchemy import event
+
+    statements = []
+    print(f"{'history':>8}  {'version':>9}  {'sync ms':>8}  {'sync SQL':>8}  {'merge ms':>8}  {'merge SQL':>9}")
+    with app.app.app_context():
+        event.listen(app.db.engine, 'before_cursor_execute', lambda *a: statements.append(a[2]))
+        for rows in args.rows:
+            results = {}
+            for legacy in (True, False):
+                sync_time, merge_time, sync_count, merge_count, state = run(app, models, rows, legacy, statements)
+                results[legacy] = state
+                print(f"{rows:>8}  {'per-row' if legacy else 'set-based':>9}  {1000 * sync_time:>8.2f}  "
+                      f"{sync_count:>8}  {1000 * merge_time:>8.2f}  {merge_count:>9}")
+            if results[True] != results[False]:
+                sys.exit(f'Set-based sign-in left a different database state at {rows} rows')
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
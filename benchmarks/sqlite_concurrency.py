@@ -0,0 +1,156 @@
+"""SQLite under the production process model: default engine vs app.py's tuning.
+
+Runs the fly.toml shape - 2 processes x 4 threads - against a scratch
+database file, each thread looping over the recommendation routes' queries:
+mostly reads (a user's exclusion ids, their watchlist) with a Recommendation
+INSERT + commit in between. Once with the engine options app.py used to use
+on every database (rollback journal, pre-ping), once with its SQLite mode
+(WAL, synchronous=NORMAL, cache/mmap, busy timeout, persistent pool), and
+prints throughput and latency percentiles for each.
+
+    python benchmarks/sqlite_concurrency.py
+    python benchmarks/sqlite_concurrency.py --seconds 10 --write-share 0.3
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+USERS = 200
+
+
+def setup(path, rows):
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    import app
+    import models
+    with app.app.app_context():
+        app.db.session.execute(app.db.insert(models.User), [
+            {'id': u, 'session_id': f'bench-{u}'} for u in range(1, USERS + 1)])
+        app.db.session.execute(app.db.insert(models.Recommendation), [{
+            'user_id': random.randint(1, USERS), 'content_type': 'movie', 'tmdb_id': str(i),
+            'title': f'Title {i}', 'overview': 'x' * 300, 'genres': [28, 18]} for i in range(rows)])
+        app.db.session.execute(app.db.insert(models.Watchlist), [{
+            'user_id': u, 'content_type': 'movie', 'tmdb_id': str(i), 'title': f'Title {i}'}
+            for u in range(1, USERS + 1) for i in range(20)])
+        app.db.session.commit()
+
+
+def make_engine(path, tuned):
+    import sqlalchemy
+    if tuned:
+        import app
+        engine = sqlalchemy.create_engine(f"sqlite:///{path}", **app.app.config["SQLALCHEMY_ENGINE_OPTIONS"])
+        sqlalchemy.event.listen(engine, "connect", app._configure_sqlite)
+    else:
+        engine = sqlalchemy.create_engine(f"sqlite:///{path}", pool_recycle=300, pool_pre_ping=True)
+    return engine
+
+
+def worker(path, tuned, seconds, threads, write_share, results):
+    from sqlalchemy import text
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    engine = make_engine(path, tuned)
+    reads, writes, errors = [], [], [0]
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def loop(seed):
+        rng = random.Random(seed)
+        local_reads, local_writes, local_errors = [], [], 0
+        while time.monotonic() < stop:
+            user = rng.randint(1, USERS)
+            started = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    if rng.random() < write_share:
+                        conn.execute(text("INSERT INTO recommendation (user_id, content_type, tmdb_id, title, "
+                                          "overview, recommended_at) VALUES (:u, 'movie', :t, 'New', :o, "
+                                          "CURRENT_TIMESTAMP)"),
+                                     {'u': user, 't': str(rng.randint(1, 10 ** 6)), 'o': 'y' * 300})
+                        conn.commit()
+                        local_writes.append(time.perf_counter() - started)
+                    else:
+                        conn.execute(text("SELECT id, tmdb_id FROM recommendation "
+                                          "WHERE user_id = :u AND content_type = 'movie' AND id > 0"),
+                                     {'u': user}).fetchall()
+                        conn.execute(text("SELECT * FROM watchlist WHERE user_id = :u ORDER BY added_at DESC"),
+                                     {'u': user}).fetchall()
+                        local_reads.append(time.perf_counter() - started)
+            except Exception:
+                local_errors += 1
+        with lock:
+            reads.extend(local_reads)
+            writes.extend(local_writes)
+            errors[0] += local_errors
+
+    pool = [threading.Thread(target=loop, args=(os.getpid() * 100 + i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put((reads, writes, errors[0]))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return 1000 * values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+
+def run(tuned, args):
+    directory = tempfile.mkdtemp(prefix='sqlite-bench-')
+    path = os.path.join(directory, 'bench.db')
+    ctx = multiprocessing.get_context('spawn')
+    prepare = ctx.Process(target=setup, args=(path, args.rows))
+    prepare.start()
+    prepare.join()
+    if not tuned:
+        import sqlite3
+        sqlite3.connect(path).execute('PRAGMA journal_mode=DELETE').close()
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(path, tuned, args.seconds, args.threads, args.write_share, results))
+             for _ in range(args.processes)]
+    for proc in procs:
+        proc.start()
+    reads, writes, errors = [], [], 0
+    for _ in procs:
+        r, w, e = results.get()
+        reads += r
+        writes += w
+        errors += e
+    for proc in procs:
+        proc.join()
+    shutil.rmtree(directory, ignore_errors=True)
+    label = 'tuned (WAL)' if tuned else 'default'
+    print(f"{label:>12}  {(len(reads) + len(writes)) / args.seconds:>8.0f}  "
+          f"{percentile(reads, 50):>8.2f}  {percentile(reads, 99):>8.2f}  "
+          f"{percentile(writes, 50):>8.2f}  {percentile(writes, 99):>8.2f}  {errors:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--write-share', type=float, default=0.2)
+    parser.add_argument('--rows', type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"{args.processes} processes x {args.threads} threads, {args.seconds:g}s, "
+          f"{args.write_share:.0%} writes, {args.rows} history rows")
+    print(f"{'engine':>12}  {'ops/s':>8}  {'read p50':>8}  {'read p99':>8}  "
+          f"{'write p50':>8}  {'write p99':>8}  {'errors':>6}   (ms)")
+    run(False, args)
+    run(True, args)
+
+
+if __name__ == '__main__':
+    main()
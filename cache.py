@@ -0,0 +1,370 @@
+"""In-process cache for outbound API responses.
+
+Entries are keyed by the tuples app.py already builds for each call -
+``('movie_credits', 550)``, ``('search_movie', 'alien')`` - and the first
+element of a key is treated as its namespace. Eviction is least-recently-used
+and bounded by an approximate memory size rather than an entry count, so a
+burst of small search responses can't push out the large, expensive credits
+and recommendation lists, and a bigger VM simply holds more. Expired entries
+are dropped lazily: when they're read, and in an occasional sweep on write.
+
+Per-namespace hit/miss/eviction counters make it visible which kinds of
+response actually pay for the memory they use.
+
+Responses are trimmed before they're cached (`project`): only the fields the
+recommenders and routes read survive, so an entry costs a fraction of the
+raw TMDB / Google Books body and far more of them fit in the budget.
+
+DiskCache is an optional second tier under it: a SQLite file shared by every
+worker on the machine that survives deploys and restarts, so a fresh worker
+starts warm instead of hitting the upstream APIs for everything again.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+# Parsed JSON costs several times its wire size as Python dicts/lists/strs;
+# measured at ~4x on TMDB list responses. Good enough to budget memory with.
+_OBJECT_OVERHEAD = 4
+
+# Run a full expired-entry sweep every this many writes.
+_SWEEP_EVERY = 1000
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Cache lifetime per key namespace, as (fresh_for, usable_for) seconds. A
+# fresh entry is served as-is. Past fresh_for but within usable_for it is
+# still served immediately, while the caller refreshes it in the background
+# (stale-while-revalidate), so slow-changing data almost never costs a
+# user-facing miss. Credits, series details and filmographies barely change;
+# discover pages drift daily.
+TTL_POLICY = {
+    'movie_credits': (7 * DAY, 30 * DAY),
+    'tv_details': (3 * DAY, 14 * DAY),
+    'director_films': (3 * DAY, 14 * DAY),
+    'tv_person_credits': (3 * DAY, 14 * DAY),
+    'movie_recs': (DAY, 7 * DAY),
+    'tv_recs': (DAY, 7 * DAY),
+    'discover_movie_pop': (6 * HOUR, 2 * DAY),
+    'discover_movie_home': (6 * HOUR, 2 * DAY),
+    'discover_tv_pop': (6 * HOUR, 2 * DAY),
+    'discover_tv_home': (6 * HOUR, 2 * DAY),
+    'search_movie': (6 * HOUR, 3 * DAY),
+    'search_tv': (6 * HOUR, 3 * DAY),
+    'google_books': (DAY, 7 * DAY),
+}
+DEFAULT_TTL = (15 * 60, HOUR)
+
+
+# Fields kept per record by `project`. A title in any TMDB list (search,
+# recommendations, discover, a person's filmography) is trimmed to what
+# scoring, explanations and the frontend use; credits keep only who did
+# which job.
+_TITLE_FIELDS = ('id', 'title', 'name', 'genre_ids', 'vote_average', 'vote_count', 'overview',
+                 'release_date', 'first_air_date', 'original_language', 'origin_country', 'poster_path')
+_FILMOGRAPHY_FIELDS = _TITLE_FIELDS + ('job',)
+_CREW_FIELDS = ('id', 'name', 'job')
+_VOLUME_FIELDS = ('title', 'subtitle', 'authors', 'publishedDate', 'description', 'categories',
+                  'averageRating', 'ratingsCount', 'pageCount', 'language', 'publisher')
+
+
+def _fields(record, fields):
+    return {field: record[field] for field in fields if field in record}
+
+
+def _title_list(data):
+    return {'results': [_fields(item, _TITLE_FIELDS) for item in data.get('results', [])]}
+
+
+def _filmography(data):
+    return {'crew': [_fields(item, _FILMOGRAPHY_FIELDS) for item in data.get('crew', [])]}
+
+
+def _credits(data):
+    return {'crew': [_fields(member, _CREW_FIELDS) for member in data.get('crew', [])]}
+
+
+def _tv_details(data):
+    return dict(_fields(data, ('id', 'name')),
+                created_by=[_fields(creator, ('id', 'name')) for creator in data.get('created_by', [])])
+
+
+def _volumes(data):
+    items = []
+    for item in data.get('items', []):
+        volume_info = item.get('volumeInfo', {})
+        trimmed = _fields(volume_info, _VOLUME_FIELDS)
+        thumbnail = volume_info.get('imageLinks', {}).get('thumbnail')
+        if thumbnail:
+            trimmed['imageLinks'] = {'thumbnail': thumbnail}
+        items.append({'id': item.get('id', ''), 'volumeInfo': trimmed})
+    return {'items': items}
+
+
+PROJECTIONS = {
+    'movie_credits': _credits,
+    'tv_details': _tv_details,
+    'director_films': _filmography,
+    'tv_person_credits': _filmography,
+    'movie_recs': _title_list,
+    'tv_recs': _title_list,
+    'discover_movie_pop': _title_list,
+    'discover_movie_home': _title_list,
+    'discover_tv_pop': _title_list,
+    'discover_tv_home': _title_list,
+    'search_movie': _title_list,
+    'search_tv': _title_list,
+    'google_books': _volumes,
+}
+
+
+def project(key, data):
+    """Trim a parsed response to the fields anything downstream reads, per
+    its key's namespace. Unknown namespaces pass through untouched."""
+    projection = PROJECTIONS.get(namespace_of(key))
+    if projection is None or not isinstance(data, dict):
+        return data
+    return projection(data)
+
+
+def approx_size(value):
+    """Rough in-memory footprint of a JSON-shaped value, in bytes."""
+    try:
+        encoded = len(json.dumps(value, separators=(',', ':'), default=str))
+    except (TypeError, ValueError):
+        encoded = len(repr(value))
+    return encoded * _OBJECT_OVERHEAD
+
+
+def namespace_of(key):
+    if isinstance(key, tuple) and key:
+        return str(key[0])
+    return str(key)
+
+
+def ttl_for(key):
+    """(fresh_for, usable_for) seconds for a cache key, from TTL_POLICY."""
+    return TTL_POLICY.get(namespace_of(key), DEFAULT_TTL)
+
+
+class ResponseCache:
+    """Thread-safe, byte-bounded LRU with per-entry TTLs.
+
+    Each entry has a hard expiry and, optionally, an earlier point after
+    which `lookup` reports it as stale.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (value, fresh_until, expires_at, size)
+        self._bytes = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _ns_stats(self, namespace):
+        stats = self._stats.get(namespace)
+        if stats is None:
+            stats = self._stats[namespace] = {
+                'hits': 0, 'stale_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0,
+                'entries': 0, 'bytes': 0
+            }
+        return stats
+
+    def _remove(self, key, reason=None):
+        _, _, _, size = self._entries.pop(key)
+        self._bytes -= size
+        stats = self._ns_stats(namespace_of(key))
+        stats['entries'] -= 1
+        stats['bytes'] -= size
+        if reason:
+            stats[reason] += 1
+
+    def get(self, key):
+        return self.lookup(key)[0]
+
+    def lookup(self, key):
+        """(value, fresh) for a usable entry, or (None, False)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            stats = self._ns_stats(namespace_of(key))
+            if entry is None:
+                stats['misses'] += 1
+                return None, False
+            value, fresh_until, expires_at, _ = entry
+            now = time.time()
+            if now > expires_at:
+                self._remove(key, 'expirations')
+                stats['misses'] += 1
+                return None, False
+            self._entries.move_to_end(key)
+            fresh = now <= fresh_until
+            stats['hits' if fresh else 'stale_hits'] += 1
+            return value, fresh
+
+    def pop(self, key):
+        """Take a usable entry's value out of the cache, or None. Atomic: of
+        several concurrent callers, only one gets the value."""
+        with self._lock:
+            entry = self._entries.get(key)
+            stats = self._ns_stats(namespace_of(key))
+            if entry is None or time.time() > entry[2]:
+                if entry is not None:
+                    self._remove(key, 'expirations')
+                stats['misses'] += 1
+                return None
+            self._remove(key)
+            stats['hits'] += 1
+            return entry[0]
+
+    def set(self, key, value, ttl_seconds, stale_ttl=None):
+        """Store `value`, fresh for `ttl_seconds` and usable (as stale) until
+        `stale_ttl` seconds from now - by default, no stale window."""
+        size = approx_size(value)
+        if size > self.max_bytes:
+            # Too big to keep, but the old value mustn't outlive its update.
+            self.delete(key)
+            return
+        now = time.time()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, now + ttl_seconds, now + max(stale_ttl or 0, ttl_seconds), size)
+            self._bytes += size
+            stats = self._ns_stats(namespace_of(key))
+            stats['entries'] += 1
+            stats['bytes'] += size
+
+            self._writes += 1
+            if self._writes % _SWEEP_EVERY == 0:
+                self._sweep_expired()
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest, 'evictions')
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _sweep_expired(self):
+        now = time.time()
+        for key in [k for k, (_, _, expires_at, _) in self._entries.items() if now > expires_at]:
+            self._remove(key, 'expirations')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            for stats in self._stats.values():
+                stats['entries'] = 0
+                stats['bytes'] = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Snapshot of totals plus per-namespace counters."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'namespaces': {ns: dict(s) for ns, s in sorted(self._stats.items())}
+            }
+
+
+class DiskCache:
+    """Persistent response store in a local SQLite file, with per-entry TTLs.
+
+    Meant for a volume shared by all gunicorn workers (/data on Fly). Each
+    thread gets its own connection; WAL mode lets the workers read while one
+    writes. Values are stored as zlib-compressed JSON. Any SQLite error is
+    treated as a miss - the cache must never take a request down with it.
+    """
+
+    _SWEEP_EVERY = 500
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'errors': 0}
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS responses ('
+                     'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, fresh_until REAL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)')
+        try:
+            # Files written before entries had a freshness window.
+            conn.execute('ALTER TABLE responses ADD COLUMN fresh_until REAL')
+        except sqlite3.OperationalError:
+            pass
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=2, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    @staticmethod
+    def _encode_key(key):
+        return json.dumps(key, separators=(',', ':'), default=str)
+
+    def get(self, key):
+        """(value, fresh_until, expires_at) for a usable entry, or (None, None, None)."""
+        try:
+            row = self._conn().execute('SELECT value, fresh_until, expires_at FROM responses WHERE key = ?',
+                                       (self._encode_key(key),)).fetchone()
+        except sqlite3.Error:
+            self._count('errors')
+            return None, None, None
+        if row is None or row[2] < time.time():
+            self._count('misses')
+            return None, None, None
+        value, fresh_until, expires_at = row
+        try:
+            value = json.loads(zlib.decompress(value))
+        except (zlib.error, ValueError):
+            # A torn or foreign row: drop it, so the next write replaces it
+            # instead of every read tripping over it.
+            self._count('errors')
+            try:
+                self._conn().execute('DELETE FROM responses WHERE key = ?', (self._encode_key(key),))
+            except sqlite3.Error:
+                pass
+            return None, None, None
+        self._count('hits')
+        return value, fresh_until or expires_at, expires_at
+
+    def set(self, key, value, ttl_seconds, stale_ttl=None):
+        payload = zlib.compress(json.dumps(value, separators=(',', ':')).encode(), 1)
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute('INSERT OR REPLACE INTO responses (key, value, fresh_until, expires_at) VALUES (?, ?, ?, ?)',
+                         (self._encode_key(key), payload, now + ttl_seconds, now + max(stale_ttl or 0, ttl_seconds)))
+            with self._lock:
+                self._stats['writes'] += 1
+                self._writes += 1
+                sweep = self._writes % self._SWEEP_EVERY == 0
+            if sweep:
+                conn.execute('DELETE FROM responses WHERE expires_at < ?', (time.time(),))
+        except sqlite3.Error:
+            self._count('errors')
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, path=self.path)
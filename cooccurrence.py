@@ -0,0 +1,169 @@
+"""Item-item co-occurrence model built from our own users' behaviour.
+
+Two titles "co-occur" when the same user has saved both to their watchlist
+or liked both as recommendations. Counted across every user, that's a
+collaborative signal TMDB can't give us - what *our* audience puts together -
+and reading it needs no HTTP at all.
+
+The model is a sparse matrix in a SQLite file, maintained incrementally by
+`flask update-cooccurrence`:
+
+    user_items   (user, item) pairs already counted - makes updates idempotent -
+                 with a per-user sequence number, so "recent" is well defined
+    items        item -> number of users, and a display record for it
+    pairs        (item, other item) -> number of users who have both
+    state        high-water marks of what has been read
+
+Each new (user, item) event adds one to the pair count for that item and
+each of the user's most recent earlier items of the same content type (up to
+MAX_ITEMS_PER_USER, newest first by when they were counted), so an update
+costs work proportional to the new events, never to the whole history, and
+is streamed in batches rather than loaded into memory. Items are keyed
+"content_type:tmdb_id".
+
+Recommenders read it through ctx['cooccurrence'] as both a candidate source
+and a scoring signal; see `related`.
+"""
+
+import json
+import math
+import sqlite3
+import threading
+
+# A user's history considered per new event. Keeps one very active account
+# from costing quadratic work, and recent taste is the relevant part anyway.
+MAX_ITEMS_PER_USER = 200
+
+# Pairs seen together by fewer users than this are noise, not signal.
+MIN_TOGETHER = 2
+
+
+def item_key(content_type, tmdb_id):
+    return f'{content_type}:{tmdb_id}'
+
+
+def item_record(content_type, tmdb_id, title, release_date, poster_path, overview, vote_average, genres,
+                authors=None):
+    """The candidate dict a recommender would get from the upstream API,
+    rebuilt from a stored Recommendation/Watchlist row."""
+    genre_ids = [g.get('id') if isinstance(g, dict) else g for g in (genres or [])]
+    if content_type == 'book':
+        return {'id': tmdb_id, 'title': title, 'authors': authors or [], 'published_date': release_date or '',
+                'overview': overview or '', 'categories': genre_ids, 'poster_path': poster_path or '',
+                'vote_average': vote_average or 0}
+    title_field, date_field = ('name', 'first_air_date') if content_type == 'tv' else ('title', 'release_date')
+    return {'id': int(tmdb_id), title_field: title, date_field: release_date or '', 'poster_path': poster_path,
+            'overview': overview or '', 'vote_average': vote_average or 0, 'genre_ids': genre_ids}
+
+
+class CooccurrenceModel:
+    """SQLite-backed co-occurrence counts. Safe to read from request threads
+    while the updater writes (WAL). Read errors are treated as no signal."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'lookups': 0, 'related': 0, 'errors': 0}
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS user_items (
+                user_id INTEGER NOT NULL, item TEXT NOT NULL, seq INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, item)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS items (
+                item TEXT PRIMARY KEY, users INTEGER NOT NULL, record TEXT NOT NULL) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS pairs (
+                a TEXT NOT NULL, b TEXT NOT NULL, together INTEGER NOT NULL, PRIMARY KEY (a, b)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        ''')
+        # Files built before seq existed: their rows all count as oldest.
+        if 'seq' not in [row[1] for row in conn.execute('PRAGMA table_info(user_items)')]:
+            conn.execute('ALTER TABLE user_items ADD COLUMN seq INTEGER NOT NULL DEFAULT 0')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_user_items_seq ON user_items (user_id, seq)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def high_water(self, name):
+        row = self._conn().execute('SELECT value FROM state WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else 0
+
+    def add_events(self, events, high_water=None):
+        """Count [(user_id, content_type, tmdb_id, record)] in one transaction,
+        optionally raising the `high_water` mark (name, value) with it - a
+        mark never moves back. Events already counted are skipped. Returns how
+        many were new."""
+        conn = self._conn()
+        added = 0
+        conn.execute('BEGIN')
+        try:
+            for user_id, content_type, tmdb_id, record in events:
+                item = item_key(content_type, tmdb_id)
+                if conn.execute(
+                        'INSERT OR IGNORE INTO user_items (user_id, item, seq) VALUES '
+                        '(?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM user_items WHERE user_id = ?))',
+                        (user_id, item, user_id)).rowcount == 0:
+                    continue
+                added += 1
+                others = [row[0] for row in conn.execute(
+                    'SELECT item FROM user_items WHERE user_id = ? AND item != ? AND item >= ? AND item < ? '
+                    'ORDER BY seq DESC LIMIT ?',
+                    (user_id, item, f'{content_type}:', f'{content_type};', MAX_ITEMS_PER_USER))]
+                conn.executemany(
+                    'INSERT INTO pairs (a, b, together) VALUES (?, ?, 1) '
+                    'ON CONFLICT (a, b) DO UPDATE SET together = together + 1',
+                    [(item, other) for other in others] + [(other, item) for other in others])
+                conn.execute(
+                    'INSERT INTO items (item, users, record) VALUES (?, 1, ?) '
+                    'ON CONFLICT (item) DO UPDATE SET users = users + 1, record = excluded.record',
+                    (item, json.dumps(record, separators=(',', ':'))))
+            if high_water:
+                conn.execute('INSERT INTO state (name, value) VALUES (?, ?) '
+                             'ON CONFLICT (name) DO UPDATE SET value = MAX(value, excluded.value)', high_water)
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return added
+
+    def related(self, content_type, source_ids, limit=30):
+        """Titles our users pair with any of `source_ids`, strongest first.
+
+        Returns [(record, strength, source_id)], one per related title, with
+        strength the cosine similarity of the two titles' user sets (0-1)
+        from whichever source is most similar.
+        """
+        best = {}
+        try:
+            conn = self._conn()
+            for source_id in dict.fromkeys(source_ids):
+                source = item_key(content_type, source_id)
+                row = conn.execute('SELECT users FROM items WHERE item = ?', (source,)).fetchone()
+                if row is None:
+                    continue
+                for other, together, users, record in conn.execute(
+                        'SELECT p.b, p.together, i.users, i.record FROM pairs p JOIN items i ON i.item = p.b '
+                        'WHERE p.a = ? AND p.together >= ? ORDER BY p.together DESC LIMIT ?',
+                        (source, MIN_TOGETHER, limit)):
+                    strength = together / math.sqrt(row[0] * users)
+                    if other not in best or strength > best[other][1]:
+                        best[other] = (record, strength, source_id)
+        except sqlite3.Error:
+            with self._lock:
+                self._stats['errors'] += 1
+            return []
+        with self._lock:
+            self._stats['lookups'] += 1
+            self._stats['related'] += len(best)
+        ranked = sorted(best.values(), key=lambda r: r[1], reverse=True)[:limit]
+        return [(json.loads(record), strength, source_id) for record, strength, source_id in ranked]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, path=self.path)
@@ -0,0 +1,165 @@
+"""Per-user exclusion sets: the ids each user has already been recommended.
+
+Every recommendation call has to skip titles the user was shown before.
+Rather than load their whole Recommendation history as ORM rows per request,
+app.py keeps each (user, content type)'s recommended ids here, per process.
+A request then costs one id-only query for rows newer than those already
+folded in - normally none - and new recommendations are added as they're
+logged (`note`). The loader is injected, so this module never imports the app.
+
+Row ids aren't committed in order: on Postgres a sequence hands out id 104
+to one transaction and 105 to another, and 105 may commit first (bulk and
+write-behind inserts hold theirs open longer). So each refresh re-reads the
+last `reread_ids` ids below the high-water mark too, not only ids above it;
+a row is missed only if that many rows were inserted, by every worker, while
+its transaction was open.
+
+Very long histories switch to a Bloom filter sized for twice the ids they
+hold: under 4 bytes per id instead of a set's ~60, and an error rate that
+reaches 0.1% only once the history doubles. The price is now and then
+skipping a title that was never actually shown, which a recommender can
+afford.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class BloomFilter:
+    """Fixed-size probabilistic set. Supports what the recommenders do with
+    exclusions - `in`, `update`, `|` and `==` - but can't be iterated."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Filters live and die in one process, so Python's own (per-process
+        # salted) hashing will do; hashing tuples mixes small ints well.
+        h = hash((item, 'bloom')) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, item):
+        bits, new = self.bits, False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+        self.count += new
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def __len__(self):
+        return self.count
+
+    def copy(self):
+        other = BloomFilter.__new__(BloomFilter)
+        other.__dict__.update(self.__dict__, bits=bytearray(self.bits))
+        return other
+
+    def __or__(self, items):
+        other = self.copy()
+        other.update(items)
+        return other
+
+    def __eq__(self, other):
+        # The same items in any order set the same bits.
+        return (isinstance(other, BloomFilter) and (self.size, self.hashes) == (other.size, other.hashes)
+                and self.bits == other.bits)
+
+    __hash__ = None
+
+
+class ExclusionCache:
+    """Recommended ids per (user id, content type), LRU-bounded to
+    `max_users` entries and fully reloaded after `ttl` seconds.
+
+    `load(user_id, content_type, after_row_id)` returns [(row_id, id)] for
+    the user's Recommendation rows with a row id above `after_row_id`.
+    """
+
+    def __init__(self, load, max_users=10000, ttl=3600, bloom_threshold=5000, error_rate=0.001,
+                 reread_ids=1000):
+        self._load = load
+        self.max_users = max_users
+        self.ttl = ttl
+        self.reread_ids = reread_ids
+        self.bloom_threshold = bloom_threshold
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # (user_id, content_type) -> {'ids', 'high_water', 'loaded_at'}
+        self._stats = {'hits': 0, 'loads': 0, 'new_rows': 0, 'blooms': 0}
+
+    def _fold(self, entry, rows):
+        ids = entry['ids']
+        for row_id, item_id in rows:
+            ids.add(item_id)
+            entry['high_water'] = max(entry['high_water'], row_id)
+        if isinstance(ids, BloomFilter):
+            if len(ids) > ids.capacity:
+                # Past its sizing the error rate climbs; rebuild on next use.
+                entry['loaded_at'] = 0
+        elif self.bloom_threshold and len(ids) > self.bloom_threshold:
+            bloom = BloomFilter(2 * len(ids), self.error_rate)
+            bloom.update(ids)
+            entry['ids'] = bloom
+            self._stats['blooms'] += 1
+
+    def get(self, user_id, content_type):
+        """The user's recommended ids, as a set (or BloomFilter) the caller
+        may add to, brought up to date with one narrow query."""
+        key = (user_id, content_type)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry['loaded_at'] < time.time() - self.ttl:
+                    del self._entries[key]
+                    entry = None
+                high_water = entry['high_water'] if entry else 0
+            rows = self._load(user_id, content_type, max(0, high_water - self.reread_ids))
+            with self._lock:
+                current = self._entries.get(key)
+                if entry is not None and current is not entry:
+                    continue    # forgotten or replaced mid-query: only a full load is safe now
+                if current is None:
+                    current = self._entries[key] = {'ids': set(), 'high_water': 0, 'loaded_at': time.time()}
+                    while len(self._entries) > self.max_users:
+                        self._entries.popitem(last=False)
+                    self._stats['loads'] += 1
+                new_rows = sum(row_id > high_water for row_id, _ in rows)
+                if entry is not None and not new_rows:
+                    self._stats['hits'] += 1
+                self._stats['new_rows'] += new_rows
+                self._fold(current, rows)
+                self._entries.move_to_end(key)
+                return current['ids'].copy()
+
+    def note(self, user_id, content_type, item_ids):
+        """Add just-recommended ids to a cached entry, ahead of its next query."""
+        with self._lock:
+            entry = self._entries.get((user_id, content_type))
+            if entry is not None:
+                entry['ids'].update(item_ids)
+
+    def forget(self, user_id):
+        """Drop a user's entries, e.g. after rows were re-parented to them."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, users=len(self._entries))
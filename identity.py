@@ -0,0 +1,100 @@
+"""Who each session is, without a User query per request.
+
+Every API call resolves the session cookie to a User, and /api/me runs on
+every page load; against a remote database that's a round-trip each time for
+a row that almost never changes. app.py keeps a snapshot of each session's
+user here, per process, for `ttl` seconds.
+
+Entries are keyed by the session id *and* the google_id the signed session
+cookie carries, so signing in or out changes the key in every worker at once
+- no worker can keep serving a guest identity for a signed-in session. What
+remains cached is only what sign-in itself rewrites (profile fields), which
+the signing-in worker replaces and others refresh within `ttl`. The loader is
+injected, so this module never imports the app.
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+
+class Identity(namedtuple('Identity', 'id session_id google_id display_name email avatar_url')):
+    """Immutable snapshot of a User row: safe to share across requests,
+    never lazy-loads."""
+
+    __slots__ = ()
+
+    @classmethod
+    def of(cls, user):
+        return cls(user.id, user.session_id, user.google_id, user.display_name, user.email, user.avatar_url)
+
+
+# A visitor with no User row yet: nothing saved, so nothing to look up.
+GUEST = Identity(None, None, None, None, None, None)
+
+
+class IdentityCache:
+    """Identity per (session id, google_id), LRU-bounded to `max_sessions`.
+
+    `load(session_id)` returns the session's Identity, or None if it has no
+    User row. Misses are cached too, per session id, so a guest who never
+    saves anything costs no query per call. `put` clears a session's miss;
+    for a row created by another worker the caller passes `has_user` (the
+    session cookie says a row exists), which skips a cached miss.
+    """
+
+    def __init__(self, load, max_sessions=10000, ttl=60):
+        self._load = load
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # (session_id, google_id) -> (identity, expires)
+        self._missing = OrderedDict()   # session_id -> expires, for sessions without a row
+        self._stats = {'hits': 0, 'loads': 0, 'misses': 0, 'cached_misses': 0}
+
+    def get(self, session_id, google_id=None, has_user=False):
+        key = (session_id, google_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[0]
+            if not has_user and self._missing.get(session_id, 0) > now:
+                self._stats['cached_misses'] += 1
+                return None
+        found = self._load(session_id)
+        if found:
+            self.put(found, google_id)
+        with self._lock:
+            self._stats['loads' if found else 'misses'] += 1
+            if not found and self.ttl > 0:
+                self._missing[session_id] = now + self.ttl
+                self._missing.move_to_end(session_id)
+                while len(self._missing) > self.max_sessions:
+                    self._missing.popitem(last=False)
+        return found
+
+    def put(self, identity, google_id=None):
+        """Cache a just-created or just-updated identity under the key its
+        session will present."""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._missing.pop(identity.session_id, None)
+            self._entries[(identity.session_id, google_id)] = (identity, time.monotonic() + self.ttl)
+            self._entries.move_to_end((identity.session_id, google_id))
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+
+    def forget(self, session_id):
+        """Drop every entry for a session, e.g. when its user is merged away."""
+        with self._lock:
+            self._missing.pop(session_id, None)
+            for key in [k for k in self._entries if k[0] == session_id]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, sessions=len(self._entries), missing=len(self._missing))
@@ -11,7 +11,8 @@ class User(db.Model):
     email = db.Column(db.String(255), nullable=True)
     display_name = db.Column(db.String(255), nullable=True)
     avatar_url = db.Column(db.String(512), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Indexed for cleanup-users, which deletes guests by age.
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     recommendations = db.relationship('Recommendation', backref='user', lazy=True, cascade='all, delete-orphan')
     watchlist = db.relationship('Watchlist', backref='user', lazy=True, cascade='all, delete-orphan')
@@ -33,6 +34,20 @@ class Recommendation(db.Model):
     recommended_at = db.Column(db.DateTime, default=datetime.utcnow)
     was_liked = db.Column(db.Boolean, default=None)  # User feedback: True=liked, False=disliked, None=no feedback
 
+    # Every per-user query is scoped by content_type, so indexes lead with
+    # both. Existing databases get them through `flask upgrade-db`.
+    __table_args__ = (
+        # Exclusions: a user's ids logged after a known row id.
+        db.Index('ix_recommendation_user_type_id', 'user_id', 'content_type', 'id'),
+        # Feedback: the latest row for one title.
+        db.Index('ix_recommendation_user_type_item', 'user_id', 'content_type', 'tmdb_id', 'recommended_at'),
+        # Taste profile: the latest rated rows. Partial, so unrated history -
+        # most of it - costs the index nothing.
+        db.Index('ix_recommendation_rated', 'user_id', 'content_type', 'recommended_at',
+                 sqlite_where=db.text('was_liked IS NOT NULL'),
+                 postgresql_where=db.text('was_liked IS NOT NULL')),
+    )
+
 class Watchlist(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -51,4 +66,7 @@ class Watchlist(db.Model):
 
     # One entry per item per user, scoped by content type since movie and TV
     # ids can collide numerically.
-    __table_args__ = (db.UniqueConstraint('user_id', 'content_type', 'tmdb_id', name='unique_user_item_watchlist'),)
+    # The constraint's index also serves lookups of one item; the watchlist
+    # page lists a user's items newest first.
+    __table_args__ = (db.UniqueConstraint('user_id', 'content_type', 'tmdb_id', name='unique_user_item_watchlist'),
+                      db.Index('ix_watchlist_user_added', 'user_id', 'added_at'))
@@ -0,0 +1,157 @@
+"""Offline index of TMDB neighborhoods, built by `flask crawl-index`.
+
+A recommendation for a handful of picks needs the same few lookups per title
+every time: its credits (or series details), its TMDB recommendations, and
+the filmography of its director (or creator). Those change slowly, so rather
+than ask TMDB live for each one, a crawler fetches them ahead of time for
+popular and recently picked titles and stores them here:
+
+    movie_credits / tv_details          title -> who made it
+    movie_recs / tv_recs                title -> related titles
+    director_films / tv_person_credits  person -> their works
+
+Records are the same projected responses the response cache holds (see
+cache.project), zlib-compressed JSON in one SQLite table keyed by
+"namespace:id". The recommenders consult the index (ctx['index']) before
+submitting a fetch and go live only for gaps and for entries older than
+`max_age`.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from cache import DAY
+
+INDEXED = ('movie_credits', 'movie_recs', 'director_films', 'tv_details', 'tv_recs', 'tv_person_credits')
+
+
+def _index_key(cache_key):
+    if isinstance(cache_key, tuple) and len(cache_key) == 2 and cache_key[0] in INDEXED:
+        return f'{cache_key[0]}:{cache_key[1]}'
+    return None
+
+
+class NeighborhoodIndex:
+    """SQLite-backed neighborhood store, read by request threads and written
+    by the crawler. Like DiskCache, any SQLite error is treated as a gap."""
+
+    def __init__(self, path, max_age=7 * DAY):
+        self.path = path
+        self.max_age = max_age
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'gaps': 0, 'too_old': 0, 'errors': 0}
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS neighbors ('
+                     'key TEXT PRIMARY KEY, value BLOB NOT NULL, crawled_at REAL NOT NULL) WITHOUT ROWID')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=2, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def get(self, cache_key):
+        """The indexed response for a fetch's cache key, or None if the key
+        isn't indexed, hasn't been crawled, or was crawled too long ago."""
+        key = _index_key(cache_key)
+        if key is None:
+            return None
+        try:
+            row = self._conn().execute('SELECT value, crawled_at FROM neighbors WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error:
+            self._count('errors')
+            return None
+        if row is None:
+            self._count('gaps')
+            return None
+        if row[1] < time.time() - self.max_age:
+            self._count('too_old')
+            return None
+        self._count('hits')
+        return json.loads(zlib.decompress(row[0]))
+
+    def crawled_at(self, cache_key):
+        row = self._conn().execute('SELECT crawled_at FROM neighbors WHERE key = ?',
+                                   (_index_key(cache_key),)).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, records):
+        """Store [(cache_key, data)] in one transaction."""
+        now = time.time()
+        rows = [(_index_key(k), zlib.compress(json.dumps(v, separators=(',', ':')).encode(), 6), now)
+                for k, v in records if _index_key(k)]
+        conn = self._conn()
+        conn.execute('BEGIN')
+        try:
+            conn.executemany('INSERT OR REPLACE INTO neighbors (key, value, crawled_at) VALUES (?, ?, ?)', rows)
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return len(rows)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, path=self.path)
+
+
+def crawl(index, fetch, base, api_key, executor, movie_ids=(), tv_ids=(), refresh_after=DAY):
+    """Fetch the neighborhoods of the given seed titles into `index`.
+
+    `fetch(url, params, cache_key)` returns parsed, projected JSON or None;
+    jobs run on `executor`. Entries crawled less than `refresh_after` seconds
+    ago are skipped, so a re-run only refreshes what has aged. Returns
+    {'fetched', 'stored', 'skipped', 'failed'}.
+    """
+    counts = {'fetched': 0, 'stored': 0, 'skipped': 0, 'failed': 0}
+    cutoff = time.time() - refresh_after
+
+    def run(jobs):
+        """Crawl (cache_key, url) jobs; returns {cache_key: data} for every
+        job with data, freshly fetched or already in the index."""
+        futures, results = [], {}
+        for cache_key, url in jobs:
+            crawled = index.crawled_at(cache_key)
+            if crawled is not None and crawled >= cutoff:
+                counts['skipped'] += 1
+                results[cache_key] = index.get(cache_key)
+                continue
+            futures.append((cache_key, executor.submit(fetch, url, {'api_key': api_key}, cache_key)))
+        records = []
+        for cache_key, future in futures:
+            data = future.result()
+            counts['fetched'] += 1
+            if data is None:
+                counts['failed'] += 1
+            else:
+                records.append((cache_key, data))
+        counts['stored'] += index.put_many(records)
+        results.update(records)
+        return {k: v for k, v in results.items() if v is not None}
+
+    movie_ids, tv_ids = sorted(set(movie_ids)), sorted(set(tv_ids))
+    titles = run([(('movie_credits', i), f"{base}/movie/{i}/credits") for i in movie_ids]
+                 + [(('movie_recs', i), f"{base}/movie/{i}/recommendations") for i in movie_ids]
+                 + [(('tv_details', i), f"{base}/tv/{i}") for i in tv_ids]
+                 + [(('tv_recs', i), f"{base}/tv/{i}/recommendations") for i in tv_ids])
+
+    directors, creators = set(), set()
+    for (namespace, _), data in titles.items():
+        if namespace == 'movie_credits':
+            directors.update(c['id'] for c in data.get('crew', []) if c.get('job') == 'Director' and c.get('id'))
+        elif namespace == 'tv_details':
+            creators.update(c['id'] for c in data.get('created_by', []) if c.get('id'))
+    run([(('director_films', p), f"{base}/person/{p}/movie_credits") for p in sorted(directors)]
+        + [(('tv_person_credits', p), f"{base}/person/{p}/tv_credits") for p in sorted(creators)])
+    return counts
@@ -0,0 +1,797 @@
+"""Plumbing for outbound TMDB / Google Books calls.
+
+app.py owns the HTTP session and the response cache; this module holds the
+concurrency helpers that sit between them and the recommenders, so
+fetch_json_cached stays a short read of what happens on a cache miss.
+
+Two fetch backends plug into the recommenders through ctx: the default runs
+each job on OutboundExecutor's threads, and AsyncFetchEngine runs them as
+asyncio tasks. Both hand back concurrent.futures.Future objects from
+`submit(fetch, url, params, cache_key)`, so recommender code is the same
+either way.
+"""
+
+import asyncio
+import functools
+import heapq
+import itertools
+import os
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+from cache import ResponseCache, namespace_of, project
+
+try:
+    import fcntl
+except ImportError:   # not on Windows; the rate limiter is then per-process
+    fcntl = None
+
+# Rate-limit priority per cache namespace, 0 = most urgent. Interactive
+# searches and the seed lookups every recommendation starts from go first;
+# discover filler pages are the first to wait when tokens run short.
+PRIORITIES = {
+    'search_movie': 0,
+    'search_tv': 0,
+    'movie_credits': 0,
+    'tv_details': 0,
+    'google_books': 0,
+    'discover_movie_pop': 2,
+    'discover_movie_home': 2,
+    'discover_tv_pop': 2,
+    'discover_tv_home': 2,
+}
+DEFAULT_PRIORITY = 1
+
+
+def priority_of(key):
+    return PRIORITIES.get(namespace_of(key), DEFAULT_PRIORITY)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; anyone arriving while it's
+    in flight waits for that result (or exception) instead of repeating the
+    call. Nothing is remembered once the call finishes - caching the result
+    is the caller's job - so this only collapses simultaneous misses, which
+    is exactly the stampede after a deploy or a cache flush.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}   # key -> Future
+        self._saved = {}   # namespace -> calls answered by someone else's fetch
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+            else:
+                namespace = namespace_of(key)
+                self._saved[namespace] = self._saved.get(namespace, 0) + 1
+
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def running(self, key):
+        """Whether a call for `key` is in flight right now."""
+        with self._lock:
+            return key in self._calls
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'saved': sum(self._saved.values()),
+                'saved_by_namespace': dict(sorted(self._saved.items()))
+            }
+
+
+_job = threading.local()
+
+
+def deferrable():
+    """Whether the calling code runs as an OutboundExecutor job, and so may
+    raise RetryAfter instead of sleeping."""
+    return getattr(_job, 'deferrable', False)
+
+
+class RetryAfter(Exception):
+    """Raised by an OutboundExecutor job that can't go on yet - typically one
+    waiting for a rate-limit token. The worker is freed at once, and
+    `retry()` runs `seconds` from now in the job's place; its outcome
+    resolves the future `submit` returned."""
+
+    def __init__(self, seconds, retry):
+        super().__init__(seconds)
+        self.seconds = seconds
+        self.retry = retry
+
+
+class OutboundExecutor:
+    """Process-wide, bounded thread pool for outbound fetches.
+
+    Built once at import and shared by every request thread, so a
+    recommendation's fan-out reuses warm threads (and, through the matching
+    HTTP connection pool, warm TLS connections) instead of spawning a pool
+    per call. Work beyond `max_workers` queues; queue depth and wait time are
+    tracked so saturation shows up in /api/stats rather than as vague slowness.
+
+    A job that has to wait (see RetryAfter) is parked on a timer instead of
+    sleeping on a worker, so a burst of throttled calls can't leave the jobs
+    queued behind it without threads.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='outbound')
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._peak_queued = 0
+        self._submitted = 0
+        self._started = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._deferrals = 0
+        self._parked = []   # heap of (due, seq, future, retry)
+        self._seq = itertools.count()
+        self._timer = None
+        self._wakeup = threading.Condition(self._lock)
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        with self._lock:
+            self._submitted += 1
+        self._dispatch(future, functools.partial(fn, *args, **kwargs))
+        return future
+
+    def _dispatch(self, future, call):
+        enqueued_at = time.monotonic()
+        with self._lock:
+            self._queued += 1
+            self._peak_queued = max(self._peak_queued, self._queued)
+
+        def run():
+            waited = time.monotonic() - enqueued_at
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._started += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            _job.deferrable = True
+            try:
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_result(call())
+            except RetryAfter as deferred:
+                self._park(future, deferred)
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                _job.deferrable = False
+                with self._lock:
+                    self._running -= 1
+
+        self._executor.submit(run)
+
+    def _park(self, future, deferred):
+        with self._lock:
+            self._deferrals += 1
+            heapq.heappush(self._parked, (time.monotonic() + deferred.seconds, next(self._seq),
+                                          future, deferred.retry))
+            if self._timer is None:
+                self._timer = threading.Thread(target=self._run_timer, name='outbound-timer', daemon=True)
+                self._timer.start()
+            self._wakeup.notify()
+
+    def _run_timer(self):
+        while True:
+            with self._lock:
+                while not self._parked or self._parked[0][0] > time.monotonic():
+                    self._wakeup.wait(self._parked[0][0] - time.monotonic() if self._parked else None)
+                _, _, future, retry = heapq.heappop(self._parked)
+            self._dispatch(future, retry)
+
+    @property
+    def queue_depth(self):
+        return self._queued
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'running': self._running,
+                'queued': self._queued,
+                'peak_queued': self._peak_queued,
+                'submitted': self._submitted,
+                'parked': len(self._parked),
+                'deferrals': self._deferrals,
+                'avg_wait_ms': round(1000 * self._wait_total / self._started, 2) if self._started else 0.0,
+                'max_wait_ms': round(1000 * self._wait_max, 2)
+            }
+
+
+class UpstreamHealth:
+    """Negative cache plus a per-host circuit breaker for outbound calls.
+
+    Without these, a dead URL or an upstream incident costs every request
+    the full timeout again, on every thread. Failed lookups are remembered
+    briefly per cache key (a 404 for an hour, errors and timeouts for
+    seconds), and a host that fails `failure_threshold` times in a row is
+    cut off for `cooldown_seconds`: calls fail fast instead of waiting.
+    After the cooldown one probe is let through (half-open); it closes the
+    breaker on success or re-opens it on failure.
+
+    Callers ask `allow(url, cache_key)` before a request and must report the
+    outcome with `record(url, cache_key, status)`, status None meaning a
+    timeout or connection error.
+    """
+
+    NEGATIVE_TTL_NOT_FOUND = 3600
+    NEGATIVE_TTL_ERROR = 30
+
+    def __init__(self, failure_threshold=5, cooldown_seconds=30):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._negative = ResponseCache(max_bytes=2 * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host(self, url):
+        host = urlsplit(url).hostname or ''
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = {
+                'state': 'closed', 'failures': 0, 'opened_at': 0.0, 'probing': False,
+                'trips': 0, 'short_circuits': 0
+            }
+        return state
+
+    def allow(self, url, cache_key):
+        if self._negative.get(cache_key) is not None:
+            return False
+        with self._lock:
+            host = self._host(url)
+            if host['state'] == 'closed':
+                return True
+            if host['state'] == 'open' and time.monotonic() - host['opened_at'] >= self.cooldown_seconds:
+                host['state'] = 'half_open'
+            if host['state'] == 'half_open' and not host['probing']:
+                host['probing'] = True
+                return True
+            host['short_circuits'] += 1
+            return False
+
+    def cancel(self, url):
+        """Give back a go-ahead from `allow` whose request was never sent."""
+        with self._lock:
+            self._host(url)['probing'] = False
+
+    def record(self, url, cache_key, status):
+        failed = status is None or status == 429 or status >= 500
+        if status == 404:
+            self._negative.set(cache_key, status, self.NEGATIVE_TTL_NOT_FOUND)
+        elif failed or status >= 400:
+            self._negative.set(cache_key, status or 0, self.NEGATIVE_TTL_ERROR)
+        with self._lock:
+            host = self._host(url)
+            was_probe, host['probing'] = host['probing'], False
+            if not failed:
+                host['state'], host['failures'] = 'closed', 0
+                return
+            host['failures'] += 1
+            if was_probe or host['failures'] >= self.failure_threshold:
+                if host['state'] != 'open':
+                    host['trips'] += 1
+                host['state'], host['opened_at'] = 'open', time.monotonic()
+
+    def stats(self):
+        negative = self._negative.stats()
+        with self._lock:
+            return {
+                'hosts': {name: {k: v for k, v in host.items() if k not in ('opened_at', 'probing')}
+                          for name, host in sorted(self._hosts.items())},
+                'negative_entries': negative['entries'],
+                'negative_hits': sum(ns['hits'] for ns in negative['namespaces'].values())
+            }
+
+
+class RateLimiter:
+    """Client-side token bucket per upstream host, shared by all workers.
+
+    `limits` maps a hostname to its rate in requests per second; the bucket
+    holds one second's worth, so short bursts go straight through and a
+    sustained fan-out is smoothed to the rate instead of drawing 429s. (It
+    never holds less than the lowest priority's threshold, or rates below
+    one per second would never grant a token.) Hosts without a limit are
+    never throttled.
+
+    The bucket lives in a small file per host under `state_dir`, updated
+    under an exclusive flock, so every gunicorn worker on the machine draws
+    from the same budget. Without fcntl or a usable directory each process
+    keeps its own bucket.
+
+    Lower-priority callers can't drain the bucket: priority 1 and 2 leave a
+    share of it (RESERVE) for priority 0, so searches and seed lookups keep
+    flowing while filler pages wait. Waits are bounded by the caller's
+    deadline, and lower priorities give up on a token sooner (WAIT_SHARE).
+    'delayed' in stats counts the waits handed out, 'wait_ms' their total.
+    """
+
+    RESERVE = (0.0, 0.1, 0.3)   # share of the bucket each priority must leave
+    WAIT_SHARE = (1.0, 0.5, 0.25)   # share of the time left each priority may spend waiting
+    _RECORD = struct.Struct('dd')   # tokens, updated_at
+
+    def __init__(self, limits, state_dir=None):
+        self.limits = {host: rate for host, rate in limits.items() if host and rate > 0}
+        self.state_dir = state_dir
+        self._lock = threading.Lock()
+        self._fds = {}
+        self._buckets = {}   # host -> (tokens, updated_at), for hosts without a state file
+        self._stats = {}
+
+    def _fd(self, host):
+        if host not in self._fds:
+            fd = None
+            if fcntl and self.state_dir:
+                try:
+                    path = os.path.join(self.state_dir, f'ratelimit-{host}.bucket')
+                    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+                except OSError:
+                    pass
+            self._fds[host] = fd
+        return self._fds[host]
+
+    def try_acquire(self, url, priority=DEFAULT_PRIORITY):
+        """Take a token: 0.0 if granted, else seconds until one may be free."""
+        host = urlsplit(url).hostname
+        rate = self.limits.get(host)
+        if rate is None:
+            return 0.0
+        floor = 1 + self.RESERVE[priority] * rate
+        capacity = max(rate, 1 + self.RESERVE[-1] * rate)
+        with self._lock:
+            fd = self._fd(host)
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                raw = os.pread(fd, self._RECORD.size, 0) if fd is not None else b''
+                if len(raw) == self._RECORD.size:
+                    tokens, updated_at = self._RECORD.unpack(raw)
+                else:
+                    tokens, updated_at = self._buckets.get(host, (capacity, now))
+                tokens = min(capacity, tokens + max(now - updated_at, 0) * rate)
+                wait = 0.0 if tokens >= floor else (floor - tokens) / rate
+                if not wait:
+                    tokens -= 1
+                if fd is not None:
+                    os.pwrite(fd, self._RECORD.pack(tokens, now), 0)
+                else:
+                    self._buckets[host] = (tokens, now)
+                return wait
+            finally:
+                if fd is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def poll(self, url, priority, deadline):
+        """One go at a token for a caller that must have it by `deadline`
+        (a time.monotonic() value): 0.0 if taken, None if it won't come in
+        time, else the seconds to wait before polling again.
+
+        "In time" is a share of what's left (WAIT_SHARE): priority 0 may wait
+        right up to the deadline, lower priorities give up sooner.
+        """
+        wait = self.try_acquire(url, priority)
+        if not wait:
+            self._count(url, 'granted')
+            return 0.0
+        if wait > self.WAIT_SHARE[priority] * (deadline - time.monotonic()):
+            self._count(url, 'rejected')
+            return None
+        self._count(url, 'delayed', wait)
+        return wait
+
+    def acquire(self, url, priority=DEFAULT_PRIORITY, deadline=None):
+        """Sleep until a token is taken (True), or give up (False) once it
+        can't come in time; see `poll`. No deadline means five seconds."""
+        deadline = time.monotonic() + 5.0 if deadline is None else deadline
+        while True:
+            wait = self.poll(url, priority, deadline)
+            if not wait:
+                return wait == 0.0
+            time.sleep(wait)
+
+    async def acquire_async(self, url, priority=DEFAULT_PRIORITY, deadline=None):
+        """`acquire` for coroutines: waits with asyncio.sleep, and takes the
+        bucket's file lock on the loop's default executor."""
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + 5.0 if deadline is None else deadline
+        while True:
+            wait = await loop.run_in_executor(None, self.poll, url, priority, deadline)
+            if not wait:
+                return wait == 0.0
+            await asyncio.sleep(wait)
+
+    def _count(self, url, outcome, wait=0.0):
+        host = urlsplit(url).hostname
+        if host not in self.limits:
+            return
+        with self._lock:
+            stats = self._stats.get(host)
+            if stats is None:
+                stats = self._stats[host] = {'granted': 0, 'delayed': 0, 'rejected': 0, 'wait_ms': 0.0}
+            stats[outcome] += 1
+            stats['wait_ms'] += 1000 * wait
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limits': dict(self.limits),
+                'shared': bool(fcntl and self.state_dir),
+                'hosts': {host: dict(s, wait_ms=round(s['wait_ms'], 1)) for host, s in sorted(self._stats.items())}
+            }
+
+
+class Hedger:
+    """Per-namespace latency tracking and hedged (duplicated) requests.
+
+    With a dozen calls in each recommendation's fan-out, the slowest one sets
+    the response time, and upstream latency has a long tail. Once a
+    namespace has enough recent samples, a request still unanswered at that
+    namespace's `percentile` latency is sent once more, and whichever copy
+    answers first wins.
+
+    Extra load is capped by `budget`. Every request earns that fraction of a
+    hedge credit (up to a small reserve), and each hedge spends one whole
+    credit, so duplicates stay under ~`budget` of traffic even when an
+    upstream slows down across the board.
+
+    `call` races blocking senders on this object's thread pools;
+    `call_async` races the copies as tasks on the caller's loop.
+    """
+
+    WINDOW = 256        # recent latency samples kept per namespace
+    MIN_SAMPLES = 32    # no hedging until a namespace has this many
+    MIN_DELAY = 0.01
+    MAX_CREDITS = 10.0
+
+    def __init__(self, budget=0.05, percentile=95, max_workers=32, max_backups=16):
+        self.budget = budget
+        self.percentile = percentile
+        self.max_workers = max_workers
+        self.max_backups = max_backups
+        self._lock = threading.Lock()
+        self._samples = {}      # namespace -> deque of seconds
+        self._observed = {}     # namespace -> samples ever recorded
+        self._thresholds = {}   # namespace -> (seconds, observations when computed)
+        self._counts = {}       # namespace -> {'requests', 'hedges', 'hedge_wins'}
+        self._credits = 0.0
+        self._primaries = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedge-primary')
+        self._primary_slots = threading.BoundedSemaphore(max_workers)
+        self._backups = ThreadPoolExecutor(max_workers=max_backups, thread_name_prefix='hedge-backup')
+        self._backup_slots = threading.BoundedSemaphore(max_backups)
+
+    def observe(self, namespace, seconds):
+        with self._lock:
+            samples = self._samples.get(namespace)
+            if samples is None:
+                samples = self._samples[namespace] = deque(maxlen=self.WINDOW)
+            samples.append(seconds)
+            self._observed[namespace] = self._observed.get(namespace, 0) + 1
+
+    def _percentile(self, samples, pct):
+        ordered = sorted(samples)
+        return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+    def delay_for(self, namespace):
+        """Seconds to wait before hedging a `namespace` call, or None."""
+        if self.budget <= 0:
+            return None
+        with self._lock:
+            samples = self._samples.get(namespace)
+            if samples is None or len(samples) < self.MIN_SAMPLES:
+                return None
+            delay, seen = self._thresholds.get(namespace, (None, 0))
+            # Re-sorting the window on every call would cost more than the
+            # threshold drifts; refresh it every 16 new samples.
+            observed = self._observed[namespace]
+            if delay is None or observed - seen >= 16:
+                delay = max(self._percentile(samples, self.percentile), self.MIN_DELAY)
+                self._thresholds[namespace] = (delay, observed)
+            return delay
+
+    def _count(self, namespace, field):
+        counts = self._counts.get(namespace)
+        if counts is None:
+            counts = self._counts[namespace] = {'requests': 0, 'hedges': 0, 'hedge_wins': 0}
+        counts[field] += 1
+
+    def _start(self, namespace):
+        with self._lock:
+            self._count(namespace, 'requests')
+            self._credits = min(self._credits + self.budget, self.MAX_CREDITS)
+
+    def _spend(self, namespace, can_hedge):
+        # Reserve the credit before `can_hedge` takes its rate-limit token,
+        # so a token is never taken for a hedge that then isn't sent.
+        with self._lock:
+            if self._credits < 1:
+                return False
+            self._credits -= 1
+        if can_hedge is not None and not can_hedge():
+            with self._lock:
+                self._credits = min(self._credits + 1, self.MAX_CREDITS)
+            return False
+        with self._lock:
+            self._count(namespace, 'hedges')
+        return True
+
+    def _won(self, namespace):
+        with self._lock:
+            self._count(namespace, 'hedge_wins')
+
+    def _timed(self, namespace, send):
+        started = time.monotonic()
+        try:
+            return send()
+        finally:
+            self.observe(namespace, time.monotonic() - started)
+
+    def call(self, namespace, send, can_hedge=None):
+        """Return `send()`, backed up by a second `send()` if it runs slow.
+
+        Once a namespace is being hedged, its primary runs on this object's
+        pool while the caller waits; past the threshold the caller sends the
+        duplicate on a separate backup pool, and whichever copy answers first
+        is returned (a loser keeps its pool thread until its own timeout).
+        Primaries and backups have their own bounded pools, so backups can
+        never starve primaries; when either pool is full the call just isn't
+        hedged, and a primary without a free thread runs on the caller's.
+
+        `can_hedge`, if given, is asked right before a duplicate goes out (to
+        take a rate-limit token, say). If both copies fail, the primary's
+        exception is raised.
+        """
+        self._start(namespace)
+        delay = self.delay_for(namespace)
+        if delay is None or not self._primary_slots.acquire(blocking=False):
+            return self._timed(namespace, send)
+        primary = self._primaries.submit(self._timed, namespace, send)
+        primary.add_done_callback(lambda _: self._primary_slots.release())
+        done, _ = wait({primary}, timeout=delay)
+        if done or not self._backup_slots.acquire(blocking=False):
+            return primary.result()
+        if not self._spend(namespace, can_hedge):
+            self._backup_slots.release()
+            return primary.result()
+        backup = self._backups.submit(self._timed, namespace, send)
+        backup.add_done_callback(lambda _: self._backup_slots.release())
+        racing = {primary, backup}
+        while racing:
+            done, racing = wait(racing, return_when=FIRST_COMPLETED)
+            for finished in sorted(done, key=lambda f: f.exception() is not None):
+                if finished.exception() is None:
+                    if finished is backup:
+                        self._won(namespace)
+                    return finished.result()
+        return primary.result()
+
+    async def call_async(self, namespace, send, can_hedge=None):
+        """`call` for coroutines: `send` is a coroutine function."""
+        self._start(namespace)
+        delay = self.delay_for(namespace)
+
+        async def timed():
+            started = time.monotonic()
+            try:
+                result = await send()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.observe(namespace, time.monotonic() - started)
+                raise
+            self.observe(namespace, time.monotonic() - started)
+            return result
+
+        if delay is None:
+            return await timed()
+        primary = asyncio.ensure_future(timed())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        # `can_hedge` may block (a rate-limit file lock): off the loop.
+        if done or not await asyncio.get_running_loop().run_in_executor(None, self._spend, namespace, can_hedge):
+            return await primary
+        backup = asyncio.ensure_future(timed())
+        racing = {primary, backup}
+        try:
+            while racing:
+                done, racing = await asyncio.wait(racing, return_when=asyncio.FIRST_COMPLETED)
+                for finished in sorted(done, key=lambda t: t.exception() is not None):
+                    if finished.exception() is None:
+                        if finished is backup:
+                            self._won(namespace)
+                        return finished.result()
+            return primary.result()
+        finally:
+            for task in racing:
+                task.cancel()
+
+    def stats(self):
+        with self._lock:
+            namespaces = {}
+            for namespace, counts in sorted(self._counts.items()):
+                samples = self._samples.get(namespace) or ()
+                latency = {f'p{pct}_ms': round(1000 * self._percentile(samples, pct), 1)
+                           for pct in (50, 95, 99)} if samples else {}
+                namespaces[namespace] = dict(counts, samples=len(samples), **latency)
+            return {
+                'budget': self.budget,
+                'percentile': self.percentile,
+                'credits': round(self._credits, 2),
+                'namespaces': namespaces
+            }
+
+
+class AsyncFetchEngine:
+    """Asyncio fetch backend: one event loop thread, one pooled HTTP client.
+
+    A thread blocked on a socket costs a stack and a pool slot for the whole
+    round-trip; a pending task costs a few KB. So rather than one thread per
+    in-flight request, every job is a task on a single background loop
+    sharing one httpx.AsyncClient, and request threads just wait on the
+    concurrent.futures.Future that `submit` returns.
+
+    It reads and writes the same response cache as the threaded path
+    (through the `cache_lookup`/`cache_set` callables passed in), coalesces
+    identical in-flight keys the way SingleFlight does, serves stale
+    entries while refreshing them in the background, and consults the same
+    UpstreamHealth, RateLimiter and Hedger (if given) for each request. Needs httpx, which is
+    imported only when an engine is actually built.
+
+    Cache reads and writes (disk tier, compression, text indexing) and the
+    rate limiter's file lock are blocking, so they run on a few helper
+    threads - the loop's default executor - never on the loop itself, where
+    they would stall every in-flight task.
+    """
+
+    BLOCKING_WORKERS = 4
+
+    def __init__(self, cache_lookup, cache_set, max_connections, health=None, rate_limiter=None, hedger=None):
+        import httpx
+
+        self._httpx = httpx
+        self.max_connections = max_connections
+        self._cache_lookup = cache_lookup
+        self._cache_set = cache_set
+        self._health = health
+        self._rate_limiter = rate_limiter
+        self._hedger = hedger
+        self._inflight = {}   # cache_key -> asyncio.Task, loop thread only
+        self._saved = 0
+        self._refreshes = 0
+        self._submitted = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(
+            ThreadPoolExecutor(max_workers=self.BLOCKING_WORKERS, thread_name_prefix='outbound-async-io'))
+        self._thread = threading.Thread(target=self._loop.run_forever, name='outbound-async', daemon=True)
+        self._thread.start()
+        self._client = asyncio.run_coroutine_threadsafe(
+            self._make_client(max_connections), self._loop).result()
+
+    async def _make_client(self, max_connections):
+        # The semaphore caps requests actually on the wire; beyond it tasks
+        # wait here rather than tripping httpx's pool-acquire timeout.
+        self._slots = asyncio.Semaphore(max_connections)
+        limits = self._httpx.Limits(max_connections=max_connections,
+                                    max_keepalive_connections=max_connections)
+        return self._httpx.AsyncClient(limits=limits)
+
+    def submit(self, fetch, *args, **kwargs):
+        """Schedule the coroutine `fetch(*args, **kwargs)` on the loop."""
+        with self._lock:
+            self._submitted += 1
+            self._pending += 1
+        future = asyncio.run_coroutine_threadsafe(fetch(*args, **kwargs), self._loop)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    @property
+    def queue_depth(self):
+        """Jobs waiting for a connection slot, like OutboundExecutor.queue_depth."""
+        return max(self._pending - self.max_connections, 0)
+
+    async def fetch(self, url, params, cache_key, ttl_seconds=None, timeout=5, deadline=None):
+        """Async counterpart of app.fetch_json_cached: JSON, or None on failure."""
+        data, fresh = await self._loop.run_in_executor(None, self._cache_lookup, cache_key)
+        if data is not None:
+            if not fresh and cache_key not in self._inflight:
+                self._refreshes += 1
+                self._start(url, params, cache_key, ttl_seconds, timeout, None)
+            return data
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            self._saved += 1
+        else:
+            inflight = self._start(url, params, cache_key, ttl_seconds, timeout, deadline)
+        # Shielded so a waiter giving up doesn't cancel the shared request.
+        return await asyncio.shield(inflight)
+
+    def _start(self, url, params, cache_key, ttl_seconds, timeout, deadline):
+        if deadline is None:
+            deadline = time.monotonic() + timeout
+        task = self._loop.create_task(self._get(url, params, cache_key, ttl_seconds, timeout, deadline))
+        self._inflight[cache_key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+        return task
+
+    async def _get(self, url, params, cache_key, ttl_seconds, timeout, deadline):
+        if self._health and not self._health.allow(url, cache_key):
+            return None
+        if self._rate_limiter and not await self._rate_limiter.acquire_async(url, priority_of(cache_key), deadline):
+            if self._health:
+                self._health.cancel(url)
+            return None
+        async def send():
+            async with self._slots:
+                return await self._client.get(url, params=params, timeout=timeout)
+
+        status = None
+        try:
+            if self._hedger:
+                response = await self._hedger.call_async(namespace_of(cache_key), send, self._can_hedge(url))
+            else:
+                response = await send()
+            status = response.status_code
+            if response.is_success:
+                return await self._loop.run_in_executor(None, self._store, cache_key, response.json(), ttl_seconds)
+        except (self._httpx.HTTPError, ValueError):
+            pass
+        finally:
+            if self._health:
+                self._health.record(url, cache_key, status)
+        return None
+
+    def _store(self, cache_key, payload, ttl_seconds):
+        data = project(cache_key, payload)
+        self._cache_set(cache_key, data, ttl_seconds)
+        return data
+
+    def _can_hedge(self, url):
+        if self._rate_limiter is None:
+            return None
+        return lambda: not self._rate_limiter.try_acquire(url, priority=2)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'submitted': self._submitted,
+                'pending': self._pending,
+                'in_flight_keys': len(self._inflight),
+                'saved': self._saved,
+                'refreshes': self._refreshes
+            }
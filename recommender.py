@@ -10,13 +10,19 @@ language boost ranks homegrown content first, replacing the old
 international-diversity bonuses.
 
 The module is dependency-injected: callers pass a `ctx` dict carrying the
-HTTP fetch helper and API configuration, so this module never imports the
-Flask app.
+HTTP fetch helper, API configuration and (optionally) the shared executor to
+run fetches on, a latency deadline, an offline neighborhood index, a
+co-occurrence model and a text-similarity index, so this module never imports
+the Flask app. When the deadline cuts a fetch off, ranking goes ahead with
+whatever arrived and the result lists the sources it had to drop.
 """
 
 import math
 import random
-from concurrent.futures import ThreadPoolExecutor
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import scoring
 
 MOVIE_GENRES = {
     28: 'Action', 12: 'Adventure', 16: 'Animation', 35: 'Comedy', 80: 'Crime',
@@ -71,25 +77,92 @@ def _dominant(values, threshold=HOME_THRESHOLD):
     return best[0] if best[1] >= threshold else None
 
 
-def _run_jobs(jobs):
-    """Run [(kind, source_id, url, params, cache_key, fetch)] in parallel.
+def _run_stages(stages, ctx, dropped=None):
+    """Run a dependency graph of fetch stages.
+
+    `stages` maps a stage name to (deps, build): once every stage named in
+    `deps` has finished, `build(results)` is called with the results so far
+    and returns that stage's jobs, [(kind, source_id, url, params, cache_key,
+    fetch)]. Stages without deps start immediately, so independent fetches
+    never wait behind a round-trip they don't need.
+
+    Fetches run on the caller's long-lived ctx['executor'] when given;
+    otherwise on a throwaway pool. Anything whose `submit(fetch, url, params,
+    cache_key)` returns a concurrent.futures.Future works - the shared thread
+    pool, or the asyncio engine with coroutine fetches. A job whose cache key
+    ctx['index'] (a neighborhood.NeighborhoodIndex) already holds is answered
+    from the index and never fetched.
 
-    Returns [(kind, source_id, data)] for jobs that produced data.
+    If ctx carries a 'deadline' (a time.monotonic() value), jobs still running
+    when it passes are left behind - they keep going and land in the response
+    cache for the next request - and their (kind, source_id) is appended to
+    `dropped`, as is (stage name, None) for a stage that never got to start.
+    One stuck upstream call can't hold the response hostage.
+
+    Returns {stage: [(kind, source_id, data)]} for jobs that produced data,
+    each list in job order.
     """
-    results = []
-    if not jobs:
-        return results
-    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
-        futures = {
-            executor.submit(fetch, url, params, cache_key): (kind, source_id)
-            for kind, source_id, url, params, cache_key, fetch in jobs
-        }
-        for future in futures:
-            kind, source_id = futures[future]
+    executor = ctx.get('executor')
+    if executor is None:
+        pool = ThreadPoolExecutor(max_workers=16)
+        try:
+            return _run_stages(stages, dict(ctx, executor=pool), dropped)
+        finally:
+            pool.shutdown(wait=False)
+
+    index = ctx.get('index')
+    slots = {name: [] for name in stages}        # job-ordered results per stage
+    remaining = {}                               # started stage -> unfinished jobs
+    pending = {}                                 # future -> (stage, index, kind, source_id)
+
+    def start_ready():
+        progressed = True
+        while progressed:
+            progressed = False
+            for name, (deps, build) in stages.items():
+                if name in remaining or any(remaining.get(d, 1) for d in deps):
+                    continue
+                jobs = build({d: [r for r in slots[d] if r] for d in slots})
+                slots[name] = [None] * len(jobs)
+                remaining[name] = len(jobs)
+                for position, (kind, source_id, url, params, cache_key, fetch) in enumerate(jobs):
+                    data = index.get(cache_key) if index else None
+                    if data:
+                        slots[name][position] = (kind, source_id, data)
+                        remaining[name] -= 1
+                        continue
+                    future = executor.submit(fetch, url, params, cache_key)
+                    pending[future] = (name, position, kind, source_id)
+                progressed = progressed or not remaining[name]
+
+    start_ready()
+    deadline = ctx.get('deadline')
+    while pending:
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            name, position, kind, source_id = pending.pop(future)
             data = future.result()
             if data:
-                results.append((kind, source_id, data))
-    return results
+                slots[name][position] = (kind, source_id, data)
+            remaining[name] -= 1
+        start_ready()
+
+    if dropped is not None:
+        for name, position, kind, source_id in sorted(pending.values(), key=lambda p: p[:2]):
+            dropped.append({'kind': kind, 'source_id': source_id})
+        for name in stages:
+            if name not in remaining:
+                dropped.append({'kind': name, 'source_id': None})
+    return {name: [r for r in results if r] for name, results in slots.items()}
+
+
+def _run_jobs(jobs, ctx, dropped=None):
+    """Run [(kind, source_id, url, params, cache_key, fetch)] in parallel as a
+    single stage; see _run_stages. Returns [(kind, source_id, data)]."""
+    return _run_stages({'jobs': ((), lambda _: jobs)}, ctx, dropped)['jobs']
 
 
 def _feedback_adjustment(item_genres, profile):
@@ -129,11 +202,197 @@ def _genre_alignment(candidate_genres, input_genre_counts):
     return min(score, 30)
 
 
+def _totals(pool, profile, excluded_ids):
+    """[(entry, base score + feedback)] for a pool's candidates not excluded."""
+    if pool.get('vectors') is None:
+        return [(entry, base + _feedback_adjustment(entry['genres'], profile))
+                for entry, base in pool['scored']
+                if entry['item'].get('id') not in excluded_ids]
+    totals = scoring.with_feedback(pool['vectors'], profile)
+    return [(entry, total) for (entry, _), total in zip(pool['scored'], totals)
+            if entry['item'].get('id') not in excluded_ids]
+
+
+def pick_from_pool(pool, profile, excluded_ids):
+    """Sample one recommendation from a scored candidate pool.
+
+    Pools (see movie_pool/tv_pool/book_pool) hold every candidate with its
+    score minus the feedback term, so a pool built once can answer several
+    "another one" requests: new exclusions are filtered out and the user's
+    current likes/dislikes re-applied here, without refetching or rescoring.
+    Returns None once nothing is left.
+    """
+    scored = _totals(pool, profile, excluded_ids)
+    if not scored:
+        return None
+    winner, _ = _weighted_pick(scored)
+    item = _EXPLAINERS[pool['content_type']](winner, pool['explain'])
+    item['dropped_sources'] = pool['dropped']
+    return item
+
+
+# A page of recommendations holds at most this many titles by one director,
+# creator or author while anything else is left, however strongly their
+# work scores: a penalty alone can't stop a filmography that outscores the
+# rest of the pool by more than it.
+MAX_PER_PERSON = 2
+
+
+def top_from_pool(pool, profile, excluded_ids, k=10):
+    """The k best candidates from a pool, diversified, each with its score.
+
+    Selection is greedy: each round takes the candidate whose score, minus a
+    redundancy penalty for sharing a director/creator/author or genres with
+    what's already chosen, is highest. A person who already has
+    MAX_PER_PERSON titles on the page gets no more until the rest of the
+    pool runs out.
+    """
+    remaining = _totals(pool, profile, excluded_ids)
+    chosen = []
+    people_seen, genres_seen = {}, {}
+    while remaining and len(chosen) < k:
+        eligible = [i for i, (entry, _) in enumerate(remaining)
+                    if all(people_seen.get(p, 0) < MAX_PER_PERSON for p in _people(entry))]
+        index = max(eligible or range(len(remaining)),
+                    key=lambda i: remaining[i][1] - _redundancy(remaining[i][0], people_seen, genres_seen))
+        entry, score = remaining.pop(index)
+        for person in _people(entry):
+            people_seen[person] = people_seen.get(person, 0) + 1
+        for genre in entry['genres']:
+            genres_seen[genre] = genres_seen.get(genre, 0) + 1
+        item = _EXPLAINERS[pool['content_type']](entry, pool['explain'])
+        item['score'] = round(score, 1)
+        chosen.append(item)
+    return chosen
+
+
+def _people(entry):
+    if entry.get('person'):
+        return [entry['person']]
+    return entry['item'].get('authors') or []
+
+
+def _redundancy(entry, people_seen, genres_seen):
+    penalty = 20 * max((people_seen.get(p, 0) for p in _people(entry)), default=0)
+    penalty += min(3 * sum(genres_seen.get(g, 0) for g in entry['genres']), 30)
+    return penalty
+
+
+def _related(ctx, content_type, picks, profile):
+    """First-party co-occurrence candidates for the picks and liked titles,
+    as [(item, strength, source_id)]; empty without ctx['cooccurrence']."""
+    model = ctx.get('cooccurrence')
+    if model is None:
+        return []
+    sources = [pick['id'] for pick in picks if pick.get('id')] + profile['liked_ids'][:10]
+    return model.related(content_type, sources)
+
+
+def _note_related(candidates, note, related):
+    """Add co-occurrence candidates through a pool's `note`, keeping each
+    entry's strongest link and which input it came from."""
+    for item, strength, source_id in related:
+        note(item, 'cooccurrence', source_id)
+        entry = candidates.get(item.get('id'))
+        if entry and strength > entry['cooccurrence']:
+            entry['cooccurrence'], entry['cooccurrence_source'] = strength, source_id
+
+
+def _cooccurrence_score(strength):
+    """Up to 40 points for titles our users pair with the inputs; a cosine
+    of ~0.66 (most fans of one have the other) earns the full amount."""
+    return min(60 * strength, 40)
+
+
+def _cooccurrence_reason(winner, pick_titles, noun):
+    source = winner.get('cooccurrence_source')
+    if source in pick_titles:
+        return f"Often saved together with {pick_titles[source]} by other {noun}."
+    return None
+
+
+def _note_text(entries, ctx, content_type, picks):
+    """Set each entry's 'text' similarity (0-1) to the picks' titles and
+    overviews, and 'text_source', the pick it reads most like, from
+    ctx['textsim'] (a textsim.TextIndex). The entries are indexed first, so
+    candidates that didn't come through the response cache score too."""
+    matches = {}
+    index = ctx.get('textsim')
+    if index is not None and entries:
+        index.add_items(content_type, [entry['item'] for entry in entries])
+        matches = index.similar(content_type, picks)
+    for entry in entries:
+        entry['text'], entry['text_source'] = matches.get(entry['item'].get('id'), (0.0, None))
+
+
+def _text_score(similarity):
+    """Up to 20 points for reading like a pick. Overviews of closely related
+    titles typically reach a cosine of 0.2-0.4; unrelated ones stay near 0."""
+    return min(60 * similarity, 20)
+
+
+# Below this similarity a shared word or two is coincidence, not a reason.
+TEXT_REASON_MIN = 0.2
+
+
+def _text_reason(winner, pick_titles):
+    source = winner.get('text_source')
+    if winner.get('text', 0) >= TEXT_REASON_MIN and source in pick_titles:
+        return f"Its premise echoes {pick_titles[source]}."
+    return None
+
+
+def _phase_c_scores(entries, affinity, home, genre_counts, ctx, books=False):
+    """Base scores (everything but feedback) for filtered candidates.
+
+    Each entry earns points for the input titles that list it as similar,
+    its co-occurrence strength, its text similarity to the picks, `affinity`
+    (how many inputs share its director/creator/author), a `home`
+    language/country match, genre alignment with the inputs and rating
+    quality - books, without TMDB-style vote counts, on a simpler rating
+    scale.
+
+    With ctx['scorer'] == 'numpy' the whole pool is scored in one vectorized
+    pass (see scoring.py) and the encoded pool is returned as well, for the
+    pick-time feedback term; otherwise (scored, None).
+    """
+    if ctx.get('scorer') == 'numpy':
+        scores, vectors = scoring.score_batch(
+            [e['genres'] for e in entries], genre_counts,
+            [len(e.get('similar_sources', ())) for e in entries], [e['cooccurrence'] for e in entries],
+            [e['text'] for e in entries], affinity, home, [e['item'].get('vote_average', 0) for e in entries],
+            None if books else [e['item'].get('vote_count', 0) for e in entries])
+        return list(zip(entries, scores)), vectors
+
+    scored = []
+    for entry, person_affinity, at_home in zip(entries, affinity, home):
+        item = entry['item']
+        score = 25 * min(len(entry.get('similar_sources', ())), 4)
+        score += _cooccurrence_score(entry['cooccurrence'])
+        score += _text_score(entry['text'])
+        if person_affinity:
+            score += 30 * min(person_affinity, 4)
+        if at_home:
+            score += 25
+        score += _genre_alignment(entry['genres'], genre_counts)
+        if books:
+            score += min(item.get('vote_average', 0) * 3, 15)
+        else:
+            score += _quality_score(item.get('vote_average', 0), item.get('vote_count', 0))
+        scored.append((entry, score))
+    return scored, None
+
+
 # ---------------------------------------------------------------------------
 # Movies
 # ---------------------------------------------------------------------------
 
 def recommend_movie(picks, profile, excluded_ids, ctx):
+    return pick_from_pool(movie_pool(picks, profile, excluded_ids, ctx), profile, excluded_ids)
+
+
+def movie_pool(picks, profile, excluded_ids, ctx):
+    """Fetch and score every movie candidate for these picks; see pick_from_pool."""
     fetch = ctx['fetch']
     base = ctx['tmdb_base']
     key = ctx['tmdb_key']
@@ -146,60 +405,82 @@ def recommend_movie(picks, profile, excluded_ids, ctx):
             input_genre_counts[genre] = input_genre_counts.get(genre, 0) + 1
 
     home_lang = _dominant([p.get('original_language') for p in picks])
+    dropped = []
 
-    # Phase A: who directed the picks (needed before filmography fetches).
-    credit_results = _run_jobs([
-        ('credits', pick['id'], f"{base}/movie/{pick['id']}/credits",
-         {'api_key': key}, ('movie_credits', pick['id']), fetch)
-        for pick in picks if pick.get('id')
-    ])
+    # Fetches form a small dependency graph rather than strict phases: only
+    # the filmography lookups need to know who directed the picks, so the
+    # per-title recommendations and discover filler start right away,
+    # alongside the credits, and the person jobs start as soon as credits land.
     director_counts, director_names = {}, {}
-    for _, _, data in credit_results:
-        for crew in data.get('crew', []):
-            if crew.get('job') == 'Director' and crew.get('id'):
-                director_counts[crew['id']] = director_counts.get(crew['id'], 0) + 1
-                director_names[crew['id']] = crew.get('name', '')
-    top_directors = sorted(director_counts.items(), key=lambda kv: kv[1], reverse=True)[:2]
-
-    # Phase B: gather candidates, most input-specific sources first.
-    jobs = []
-    for pick in picks:
-        if pick.get('id'):
-            jobs.append(('similar', pick['id'], f"{base}/movie/{pick['id']}/recommendations",
-                         {'api_key': key}, ('movie_recs', pick['id']), fetch))
-    for liked_id in profile['liked_ids'][:4]:
-        jobs.append(('liked_similar', liked_id, f"{base}/movie/{liked_id}/recommendations",
-                     {'api_key': key}, ('movie_recs', str(liked_id)), fetch))
-    for director_id, _ in top_directors:
-        jobs.append(('person', director_id, f"{base}/person/{director_id}/movie_credits",
-                     {'api_key': key}, ('director_films', director_id), fetch))
+
+    def credit_jobs(_):
+        return [('credits', pick['id'], f"{base}/movie/{pick['id']}/credits",
+                 {'api_key': key}, ('movie_credits', pick['id']), fetch)
+                for pick in picks if pick.get('id')]
+
+    def similar_jobs(_):
+        jobs = []
+        for pick in picks:
+            if pick.get('id'):
+                jobs.append(('similar', pick['id'], f"{base}/movie/{pick['id']}/recommendations",
+                             {'api_key': key}, ('movie_recs', pick['id']), fetch))
+        for liked_id in profile['liked_ids'][:4]:
+            jobs.append(('liked_similar', liked_id, f"{base}/movie/{liked_id}/recommendations",
+                         {'api_key': key}, ('movie_recs', str(liked_id)), fetch))
+        return jobs
+
+    def person_jobs(results):
+        for _, _, data in results['credits']:
+            for crew in data.get('crew', []):
+                if crew.get('job') == 'Director' and crew.get('id'):
+                    director_counts[crew['id']] = director_counts.get(crew['id'], 0) + 1
+                    director_names[crew['id']] = crew.get('name', '')
+        top_directors = sorted(director_counts.items(), key=lambda kv: kv[1], reverse=True)[:2]
+        return [('person', director_id, f"{base}/person/{director_id}/movie_credits",
+                 {'api_key': key}, ('director_films', director_id), fetch)
+                for director_id, _ in top_directors]
+
     genre_filter = '|'.join(str(g) for g, _ in
                             sorted(input_genre_counts.items(), key=lambda kv: kv[1], reverse=True)[:3])
-    for page in (1, 2):
-        jobs.append(('filler', None, f"{base}/discover/movie", {
-            'api_key': key, 'with_genres': genre_filter,
-            'sort_by': 'popularity.desc', 'vote_count.gte': 300, 'page': page
-        }, ('discover_movie_pop', genre_filter, page), fetch))
-    if home_lang:
-        jobs.append(('filler', None, f"{base}/discover/movie", {
-            'api_key': key, 'with_genres': genre_filter,
-            'with_original_language': home_lang,
-            'sort_by': 'popularity.desc', 'vote_count.gte': 100, 'page': 1
-        }, ('discover_movie_home', genre_filter, home_lang), fetch))
-
-    candidates = {}   # id -> {'item', 'similar_sources': set, 'person': id|None}
+
+    def filler_jobs(_):
+        jobs = []
+        for page in (1, 2):
+            jobs.append(('filler', None, f"{base}/discover/movie", {
+                'api_key': key, 'with_genres': genre_filter,
+                'sort_by': 'popularity.desc', 'vote_count.gte': 300, 'page': page
+            }, ('discover_movie_pop', genre_filter, page), fetch))
+        if home_lang:
+            jobs.append(('filler', None, f"{base}/discover/movie", {
+                'api_key': key, 'with_genres': genre_filter,
+                'with_original_language': home_lang,
+                'sort_by': 'popularity.desc', 'vote_count.gte': 100, 'page': 1
+            }, ('discover_movie_home', genre_filter, home_lang), fetch))
+        return jobs
+
+    results = _run_stages({
+        'credits': ((), credit_jobs),
+        'similar': ((), similar_jobs),
+        'filler': ((), filler_jobs),
+        'person': (('credits',), person_jobs),
+    }, ctx, dropped)
+
+    candidates = {}   # id -> {'item', 'similar_sources': set, 'person': id|None, 'cooccurrence': 0-1, ...}
 
     def note(item, kind, source_id):
         cid = item.get('id')
         if not cid or cid in excluded_ids:
             return
-        entry = candidates.setdefault(cid, {'item': item, 'similar_sources': set(), 'person': None})
+        entry = candidates.setdefault(cid, {'item': item, 'similar_sources': set(), 'person': None,
+                                            'cooccurrence': 0.0, 'cooccurrence_source': None})
         if kind in ('similar', 'liked_similar'):
             entry['similar_sources'].add(source_id)
         elif kind == 'person':
             entry['person'] = source_id
 
-    for kind, source_id, data in _run_jobs(jobs):
+    # Most input-specific sources first: the first source to mention a title
+    # supplies its item dict.
+    for kind, source_id, data in results['similar'] + results['person'] + results['filler']:
         if kind == 'person':
             # Person credits list every role unfiltered; keep only films the
             # person actually directed so affinity claims stay truthful.
@@ -209,33 +490,44 @@ def recommend_movie(picks, profile, excluded_ids, ctx):
         else:
             for item in data.get('results', []):
                 note(item, kind, source_id)
+    _note_related(candidates, note, _related(ctx, 'movie', picks, profile))
 
-    # Phase C: filter and score.
-    scored = []
+    # Phase C: filter and score. Co-occurrence records come from our own
+    # tables, which don't keep vote counts; their users vouch for them instead.
+    kept = []
     for cid, entry in candidates.items():
         item = entry['item']
-        if (item.get('vote_average', 0) < 6.0 or item.get('vote_count', 0) < 30
+        if (item.get('vote_average', 0) < 6.0
+                or (item.get('vote_count', 0) < 30 and not entry['cooccurrence'])
                 or not item.get('overview') or not item.get('release_date')):
             continue
+        entry['genres'] = item.get('genre_ids', [])
+        kept.append(entry)
+    _note_text(kept, ctx, 'movie', picks)
+    scored, vectors = _phase_c_scores(
+        kept, [director_counts.get(e['person'], 0) if e['person'] else 0 for e in kept],
+        [bool(home_lang) and e['item'].get('original_language') == home_lang for e in kept],
+        input_genre_counts, ctx)
+
+    return {
+        'content_type': 'movie',
+        'scored': scored,
+        'vectors': vectors,
+        'dropped': dropped,
+        'explain': {
+            'pick_titles': pick_titles, 'input_genre_counts': input_genre_counts,
+            'home_lang': home_lang, 'person_counts': director_counts, 'person_names': director_names
+        }
+    }
 
-        genres = item.get('genre_ids', [])
-        score = 25 * min(len(entry['similar_sources']), 4)
-        if entry['person']:
-            score += 30 * min(director_counts.get(entry['person'], 0), 4)
-        if home_lang and item.get('original_language') == home_lang:
-            score += 25
-        score += _genre_alignment(genres, input_genre_counts)
-        score += _feedback_adjustment(genres, profile)
-        score += _quality_score(item.get('vote_average', 0), item.get('vote_count', 0))
-        scored.append((entry, score))
-
-    if not scored:
-        return None
 
-    winner, _ = _weighted_pick(scored)
+def _explain_movie(winner, explain):
     item = dict(winner['item'])
     item['genres'] = [{'id': g, 'name': MOVIE_GENRES.get(g, f'Genre {g}')}
                       for g in item.get('genre_ids', [])]
+    director_counts, director_names = explain['person_counts'], explain['person_names']
+    pick_titles, input_genre_counts = explain['pick_titles'], explain['input_genre_counts']
+    home_lang = explain['home_lang']
 
     # Reasoning: lead with the most specific true fact we have.
     parts = []
@@ -246,10 +538,16 @@ def recommend_movie(picks, profile, excluded_ids, ctx):
         parts.append(f"Directed by {director_names[person]}, whose work you already picked.")
     else:
         contributing = [pick_titles[s] for s in winner['similar_sources'] if s in pick_titles][:2]
+        together = _cooccurrence_reason(winner, pick_titles, 'viewers')
+        echoes = _text_reason(winner, pick_titles)
         if contributing:
             parts.append(f"A favorite among people who loved {' and '.join(contributing)}.")
         elif winner['similar_sources']:
             parts.append("Picked up from titles you recently loved.")
+        elif together:
+            parts.append(together)
+        elif echoes:
+            parts.append(echoes)
         else:
             shared = [MOVIE_GENRES[g] for g in item.get('genre_ids', []) if g in input_genre_counts and g in MOVIE_GENRES]
             if shared:
@@ -260,8 +558,8 @@ def recommend_movie(picks, profile, excluded_ids, ctx):
         lang_name = LANGUAGE_NAMES.get(home_lang)
         if lang_name:
             parts.append(f"A homegrown {lang_name} film, like your picks.")
-    if len(parts) < 3 and item.get('vote_average', 0) >= 7.5:
-        parts.append(f"Rated {item['vote_average']:.1f}/10 by {item.get('vote_count', 0):,} viewers.")
+    if len(parts) < 3 and item.get('vote_average', 0) >= 7.5 and item.get('vote_count'):
+        parts.append(f"Rated {item['vote_average']:.1f}/10 by {item['vote_count']:,} viewers.")
     item['reasoning'] = ' '.join(parts[:3])
     return item
 
@@ -271,6 +569,11 @@ def recommend_movie(picks, profile, excluded_ids, ctx):
 # ---------------------------------------------------------------------------
 
 def recommend_tv(picks, profile, excluded_ids, ctx):
+    return pick_from_pool(tv_pool(picks, profile, excluded_ids, ctx), profile, excluded_ids)
+
+
+def tv_pool(picks, profile, excluded_ids, ctx):
+    """Fetch and score every series candidate for these picks; see pick_from_pool."""
     fetch = ctx['fetch']
     base = ctx['tmdb_base']
     key = ctx['tmdb_key']
@@ -287,48 +590,65 @@ def recommend_tv(picks, profile, excluded_ids, ctx):
 
     home_country = _dominant(input_countries)
     reality_ok = 10764 in input_genre_counts
+    dropped = []
 
-    # Phase A: who created the picks.
-    detail_results = _run_jobs([
-        ('details', pick['id'], f"{base}/tv/{pick['id']}",
-         {'api_key': key}, ('tv_details', pick['id']), fetch)
-        for pick in picks if pick.get('id')
-    ])
+    # Same dependency graph as movie_pool: only the person-credit jobs
+    # wait for the series details that name the creators.
     creator_counts, creator_names = {}, {}
-    for _, _, data in detail_results:
-        for creator in data.get('created_by', []):
-            if creator.get('id'):
-                creator_counts[creator['id']] = creator_counts.get(creator['id'], 0) + 1
-                creator_names[creator['id']] = creator.get('name', '')
-    top_creators = sorted(creator_counts.items(), key=lambda kv: kv[1], reverse=True)[:2]
-
-    # Phase B: gather candidates.
-    jobs = []
-    for pick in picks:
-        if pick.get('id'):
-            jobs.append(('similar', pick['id'], f"{base}/tv/{pick['id']}/recommendations",
-                         {'api_key': key}, ('tv_recs', pick['id']), fetch))
-    for liked_id in profile['liked_ids'][:4]:
-        jobs.append(('liked_similar', liked_id, f"{base}/tv/{liked_id}/recommendations",
-                     {'api_key': key}, ('tv_recs', str(liked_id)), fetch))
-    for creator_id, _ in top_creators:
+
+    def detail_jobs(_):
+        return [('details', pick['id'], f"{base}/tv/{pick['id']}",
+                 {'api_key': key}, ('tv_details', pick['id']), fetch)
+                for pick in picks if pick.get('id')]
+
+    def similar_jobs(_):
+        jobs = []
+        for pick in picks:
+            if pick.get('id'):
+                jobs.append(('similar', pick['id'], f"{base}/tv/{pick['id']}/recommendations",
+                             {'api_key': key}, ('tv_recs', pick['id']), fetch))
+        for liked_id in profile['liked_ids'][:4]:
+            jobs.append(('liked_similar', liked_id, f"{base}/tv/{liked_id}/recommendations",
+                         {'api_key': key}, ('tv_recs', str(liked_id)), fetch))
+        return jobs
+
+    def person_jobs(results):
+        for _, _, data in results['details']:
+            for creator in data.get('created_by', []):
+                if creator.get('id'):
+                    creator_counts[creator['id']] = creator_counts.get(creator['id'], 0) + 1
+                    creator_names[creator['id']] = creator.get('name', '')
+        top_creators = sorted(creator_counts.items(), key=lambda kv: kv[1], reverse=True)[:2]
         # Person credits rather than discover's with_people, which does not
         # actually constrain TV results.
-        jobs.append(('person', creator_id, f"{base}/person/{creator_id}/tv_credits",
-                     {'api_key': key}, ('tv_person_credits', creator_id), fetch))
+        return [('person', creator_id, f"{base}/person/{creator_id}/tv_credits",
+                 {'api_key': key}, ('tv_person_credits', creator_id), fetch)
+                for creator_id, _ in top_creators]
+
     genre_filter = '|'.join(str(g) for g, _ in
                             sorted(input_genre_counts.items(), key=lambda kv: kv[1], reverse=True)[:3])
-    for page in (1, 2):
-        jobs.append(('filler', None, f"{base}/discover/tv", {
-            'api_key': key, 'with_genres': genre_filter,
-            'sort_by': 'popularity.desc', 'vote_count.gte': 150, 'page': page
-        }, ('discover_tv_pop', genre_filter, page), fetch))
-    if home_country:
-        jobs.append(('filler', None, f"{base}/discover/tv", {
-            'api_key': key, 'with_genres': genre_filter,
-            'with_origin_country': home_country,
-            'sort_by': 'popularity.desc', 'vote_count.gte': 50, 'page': 1
-        }, ('discover_tv_home', genre_filter, home_country), fetch))
+
+    def filler_jobs(_):
+        jobs = []
+        for page in (1, 2):
+            jobs.append(('filler', None, f"{base}/discover/tv", {
+                'api_key': key, 'with_genres': genre_filter,
+                'sort_by': 'popularity.desc', 'vote_count.gte': 150, 'page': page
+            }, ('discover_tv_pop', genre_filter, page), fetch))
+        if home_country:
+            jobs.append(('filler', None, f"{base}/discover/tv", {
+                'api_key': key, 'with_genres': genre_filter,
+                'with_origin_country': home_country,
+                'sort_by': 'popularity.desc', 'vote_count.gte': 50, 'page': 1
+            }, ('discover_tv_home', genre_filter, home_country), fetch))
+        return jobs
+
+    results = _run_stages({
+        'details': ((), detail_jobs),
+        'similar': ((), similar_jobs),
+        'filler': ((), filler_jobs),
+        'person': (('details',), person_jobs),
+    }, ctx, dropped)
 
     candidates = {}
 
@@ -336,13 +656,14 @@ def recommend_tv(picks, profile, excluded_ids, ctx):
         cid = item.get('id')
         if not cid or cid in excluded_ids:
             return
-        entry = candidates.setdefault(cid, {'item': item, 'similar_sources': set(), 'person': None})
+        entry = candidates.setdefault(cid, {'item': item, 'similar_sources': set(), 'person': None,
+                                            'cooccurrence': 0.0, 'cooccurrence_source': None})
         if kind in ('similar', 'liked_similar'):
             entry['similar_sources'].add(source_id)
         elif kind == 'person':
             entry['person'] = source_id
 
-    for kind, source_id, data in _run_jobs(jobs):
+    for kind, source_id, data in results['similar'] + results['person'] + results['filler']:
         if kind == 'person':
             for item in data.get('crew', []):
                 if item.get('job') in TV_AUTHORSHIP_JOBS and item.get('vote_count', 0) >= 50:
@@ -350,35 +671,46 @@ def recommend_tv(picks, profile, excluded_ids, ctx):
         else:
             for item in data.get('results', []):
                 note(item, kind, source_id)
+    _note_related(candidates, note, _related(ctx, 'tv', picks, profile))
 
     # Phase C: filter and score.
-    scored = []
+    kept = []
     for cid, entry in candidates.items():
         item = entry['item']
-        if (item.get('vote_average', 0) < 6.0 or item.get('vote_count', 0) < 30
+        if (item.get('vote_average', 0) < 6.0
+                or (item.get('vote_count', 0) < 30 and not entry['cooccurrence'])
                 or not item.get('overview')):
             continue
         genres = item.get('genre_ids', [])
         if not reality_ok and 10764 in genres:
             continue
+        entry['genres'] = genres
+        kept.append(entry)
+    _note_text(kept, ctx, 'tv', picks)
+    scored, vectors = _phase_c_scores(
+        kept, [creator_counts.get(e['person'], 0) if e['person'] else 0 for e in kept],
+        [bool(home_country) and home_country in (e['item'].get('origin_country') or []) for e in kept],
+        input_genre_counts, ctx)
+
+    return {
+        'content_type': 'tv',
+        'scored': scored,
+        'vectors': vectors,
+        'dropped': dropped,
+        'explain': {
+            'pick_titles': pick_titles, 'input_genre_counts': input_genre_counts,
+            'home_country': home_country, 'person_counts': creator_counts, 'person_names': creator_names
+        }
+    }
 
-        score = 25 * min(len(entry['similar_sources']), 4)
-        if entry['person']:
-            score += 30 * min(creator_counts.get(entry['person'], 0), 4)
-        if home_country and home_country in (item.get('origin_country') or []):
-            score += 25
-        score += _genre_alignment(genres, input_genre_counts)
-        score += _feedback_adjustment(genres, profile)
-        score += _quality_score(item.get('vote_average', 0), item.get('vote_count', 0))
-        scored.append((entry, score))
-
-    if not scored:
-        return None
 
-    winner, _ = _weighted_pick(scored)
+def _explain_tv(winner, explain):
     item = dict(winner['item'])
     item['genres'] = [{'id': g, 'name': TV_GENRES.get(g, f'Genre {g}')}
                       for g in item.get('genre_ids', [])]
+    creator_counts, creator_names = explain['person_counts'], explain['person_names']
+    pick_titles, input_genre_counts = explain['pick_titles'], explain['input_genre_counts']
+    home_country = explain['home_country']
 
     parts = []
     person = winner['person']
@@ -388,10 +720,16 @@ def recommend_tv(picks, profile, excluded_ids, ctx):
         parts.append(f"From {creator_names[person]}, whose work you already picked.")
     else:
         contributing = [pick_titles[s] for s in winner['similar_sources'] if s in pick_titles][:2]
+        together = _cooccurrence_reason(winner, pick_titles, 'viewers')
+        echoes = _text_reason(winner, pick_titles)
         if contributing:
             parts.append(f"A favorite among people who loved {' and '.join(contributing)}.")
         elif winner['similar_sources']:
             parts.append("Picked up from shows you recently loved.")
+        elif together:
+            parts.append(together)
+        elif echoes:
+            parts.append(echoes)
         else:
             shared = [TV_GENRES[g] for g in item.get('genre_ids', []) if g in input_genre_counts and g in TV_GENRES]
             if shared:
@@ -402,8 +740,8 @@ def recommend_tv(picks, profile, excluded_ids, ctx):
         country_name = COUNTRY_NAMES.get(home_country)
         if country_name:
             parts.append(f"A homegrown {country_name} series, like your picks.")
-    if len(parts) < 3 and item.get('vote_average', 0) >= 7.5:
-        parts.append(f"Rated {item['vote_average']:.1f}/10 by {item.get('vote_count', 0):,} viewers.")
+    if len(parts) < 3 and item.get('vote_average', 0) >= 7.5 and item.get('vote_count'):
+        parts.append(f"Rated {item['vote_average']:.1f}/10 by {item['vote_count']:,} viewers.")
     item['reasoning'] = ' '.join(parts[:3])
     return item
 
@@ -412,8 +750,42 @@ def recommend_tv(picks, profile, excluded_ids, ctx):
 # Books
 # ---------------------------------------------------------------------------
 
+def books_from_volumes(data, excluded_ids):
+    """Normalize a Google Books /volumes response into book dicts, skipping
+    excluded ids."""
+    books = []
+    for item in (data or {}).get('items', []):
+        volume_info = item.get('volumeInfo', {})
+        book_id = item.get('id', '')
+        if book_id in excluded_ids:
+            continue
+        books.append({
+            'id': book_id,
+            'title': volume_info.get('title', 'Unknown Title'),
+            'authors': volume_info.get('authors', ['Unknown Author']),
+            'published_date': volume_info.get('publishedDate', ''),
+            'overview': volume_info.get('description', '')[:500] if volume_info.get('description') else '',
+            'categories': volume_info.get('categories', []),
+            'poster_path': volume_info.get('imageLinks', {}).get('thumbnail', '').replace('http:', 'https:'),
+            'vote_average': float(volume_info.get('averageRating', 0) or 0),
+            'vote_count': int(volume_info.get('ratingsCount', 0) or 0),
+            'page_count': int(volume_info.get('pageCount', 0) or 0),
+            'language': volume_info.get('language', 'en'),
+            'publisher': volume_info.get('publisher', ''),
+            'subtitle': volume_info.get('subtitle', '')
+        })
+    return books
+
+
 def recommend_book(picks, profile, excluded_ids, ctx):
-    fetch_books = ctx['fetch_books']
+    return pick_from_pool(book_pool(picks, profile, excluded_ids, ctx), profile, excluded_ids)
+
+
+def book_pool(picks, profile, excluded_ids, ctx):
+    """Fetch and score every book candidate for these picks; see pick_from_pool."""
+    fetch = ctx['fetch']
+    base = ctx['books_base']
+    key = ctx['books_key']
 
     category_counts = {}
     author_counts = {}
@@ -439,35 +811,60 @@ def recommend_book(picks, profile, excluded_ids, ctx):
         if home_lang and home_lang != 'en':
             searches.append((f'subject:{category}', 20, home_lang))
 
+    jobs = []
+    for query, max_results, lang in searches:
+        params = {'q': query, 'maxResults': max_results, 'key': key}
+        if lang:
+            params['langRestrict'] = lang
+        jobs.append(('search', query, f"{base}/volumes", params,
+                     ('google_books', query, max_results, lang), fetch))
+
     candidates = {}
-    with ThreadPoolExecutor(max_workers=max(len(searches), 1)) as executor:
-        futures = [executor.submit(fetch_books, query, excluded_ids, max_results, lang)
-                   for query, max_results, lang in searches]
-        for future in futures:
-            for book in future.result() or []:
+    dropped = []
+    for _, _, data in _run_jobs(jobs, ctx, dropped):
+        for book in books_from_volumes(data, excluded_ids):
+            candidates.setdefault(book['id'], book)
+    together = {}   # book id -> (strength, source_id)
+    for book, strength, source_id in _related(ctx, 'book', picks, profile):
+        if book['id'] not in excluded_ids:
+            candidates.setdefault(book['id'], book)
+            together[book['id']] = max(together.get(book['id'], (0, None)), (strength, source_id))
+    # Without a similar-titles endpoint, the books that read most like the
+    # picks stand in for one: earlier searches' results, from the text index.
+    if ctx.get('textsim') is not None:
+        for record, _, _ in ctx['textsim'].neighbors('book', picks, exclude=excluded_ids):
+            # Indexed straight from cached responses (Google Books volumes)
+            # or from earlier pools (already normalized).
+            for book in books_from_volumes({'items': [record]}, excluded_ids) if 'volumeInfo' in record else [record]:
                 candidates.setdefault(book['id'], book)
 
-    scored = []
+    kept = []
     for book in candidates.values():
         if not book.get('overview'):
             continue
-        categories = book.get('categories', [])
-        authors = book.get('authors', [])
-
-        author_affinity = max((author_counts.get(a, 0) for a in authors), default=0)
-        score = 30 * min(author_affinity, 4)
-        if home_lang and book.get('language') == home_lang:
-            score += 25
-        score += _genre_alignment(categories, category_counts)
-        score += _feedback_adjustment(categories, profile)
-        score += min(book.get('vote_average', 0) * 3, 15)
-        scored.append((book, score))
-
-    if not scored:
-        return None
-
-    book, _ = _weighted_pick(scored)
-    book = dict(book)
+        strength, source_id = together.get(book['id'], (0.0, None))
+        kept.append({'item': book, 'genres': book.get('categories', []),
+                     'cooccurrence': strength, 'cooccurrence_source': source_id})
+    _note_text(kept, ctx, 'book', picks)
+    scored, vectors = _phase_c_scores(
+        kept, [max((author_counts.get(a, 0) for a in e['item'].get('authors', [])), default=0) for e in kept],
+        [bool(home_lang) and e['item'].get('language') == home_lang for e in kept],
+        category_counts, ctx, books=True)
+
+    return {
+        'content_type': 'book',
+        'scored': scored,
+        'vectors': vectors,
+        'dropped': dropped,
+        'explain': {'author_counts': author_counts, 'category_counts': category_counts, 'home_lang': home_lang,
+                    'pick_titles': {pick.get('id'): pick.get('title', '') for pick in picks}}
+    }
+
+
+def _explain_book(winner, explain):
+    book = dict(winner['item'])
+    author_counts, category_counts = explain['author_counts'], explain['category_counts']
+    home_lang = explain['home_lang']
 
     parts = []
     shared_authors = [a for a in book.get('authors', []) if a in author_counts]
@@ -480,7 +877,13 @@ def recommend_book(picks, profile, excluded_ids, ctx):
             parts.append(f"Another book from {author}, whose work you already picked.")
     else:
         shared = [c for c in book.get('categories', []) if c in category_counts]
-        if shared:
+        together = _cooccurrence_reason(winner, explain['pick_titles'], 'readers')
+        echoes = _text_reason(winner, explain['pick_titles'])
+        if together:
+            parts.append(together)
+        elif echoes:
+            parts.append(echoes)
+        elif shared:
             parts.append(f"A strong match for your {', '.join(shared[:2]).lower()} shelves.")
         else:
             parts.append("Thematically connected to your picks.")
@@ -492,3 +895,6 @@ def recommend_book(picks, profile, excluded_ids, ctx):
         parts.append("Highly rated by readers.")
     book['reasoning'] = ' '.join(parts[:3])
     return book
+
+
+_EXPLAINERS = {'movie': _explain_movie, 'tv': _explain_tv, 'book': _explain_book}
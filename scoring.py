@@ -0,0 +1,86 @@
+"""Vectorized (NumPy) Phase C scoring for the recommenders.
+
+recommender.py scores candidates one at a time: a handful of dict lookups
+plus _genre_alignment, _quality_score and, at pick time,
+_feedback_adjustment per item. That's fine for the couple of hundred
+candidates live TMDB calls produce, but with local candidate sources
+(neighborhood index, co-occurrence) pools reach thousands and the loop
+dominates CPU. Here the same formulas run over whole arrays: candidates are
+encoded once as per-item feature vectors plus a sparse (item, genre) list,
+and every score comes out of one pass.
+
+Scores match the per-item path to floating-point tolerance;
+benchmarks/phase_c.py checks that and times both. NumPy is optional and
+only imported when a pool is actually scored this way (SCORER=numpy).
+"""
+
+
+def available():
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _encode_genres(np, genre_lists):
+    """Sparse multi-hot: (vocab, rows, cols), one (row, col) per genre mention."""
+    vocab, rows, cols = {}, [], []
+    for row, genres in enumerate(genre_lists):
+        for genre in genres:
+            rows.append(row)
+            cols.append(vocab.setdefault(genre, len(vocab)))
+    return vocab, np.array(rows, dtype=np.int32), np.array(cols, dtype=np.int32)
+
+
+def _per_genre(np, vocab, fn):
+    weights = np.zeros(len(vocab))
+    for genre, col in vocab.items():
+        weights[col] = fn(genre)
+    return weights
+
+
+def score_batch(genre_lists, genre_counts, similar, together, text, affinity, home, vote_average,
+                vote_count=None, person_weight=30):
+    """Base scores (everything but feedback) for a pool's candidates.
+
+    Per candidate: how many input titles list it as similar, its
+    co-occurrence strength, its text similarity to the picks, the input
+    count of its director/creator/author, whether it matches the home
+    language/country, its genres and its votes. Books pass vote_count=None
+    for their simpler quality term.
+
+    Returns (scores, vectors): a list of floats in candidate order, and the
+    encoded pool to hand back to `with_feedback` at pick time.
+    """
+    import numpy as np
+
+    n = len(genre_lists)
+    vocab, rows, cols = _encode_genres(np, genre_lists)
+    alignment_weights = _per_genre(np, vocab, lambda g: 4 * min(genre_counts.get(g, 0), 3))
+    alignment = np.minimum(np.bincount(rows, weights=alignment_weights[cols], minlength=n), 30)
+
+    vote_average = np.asarray(vote_average, dtype=float)
+    if vote_count is None:
+        quality = np.minimum(vote_average * 3, 15)
+    else:
+        quality = np.minimum(vote_average * np.log10(np.asarray(vote_count, dtype=float) + 1) * 0.4, 15)
+
+    scores = (25 * np.minimum(np.asarray(similar, dtype=float), 4)
+              + np.minimum(60 * np.asarray(together, dtype=float), 40)
+              + np.minimum(60 * np.asarray(text, dtype=float), 20)
+              + person_weight * np.minimum(np.asarray(affinity, dtype=float), 4)
+              + 25 * np.asarray(home, dtype=float)
+              + alignment + quality)
+    return scores.tolist(), {'base': scores, 'vocab': vocab, 'rows': rows, 'cols': cols}
+
+
+def with_feedback(vectors, profile):
+    """Base scores plus each candidate's _feedback_adjustment, as a list."""
+    import numpy as np
+
+    liked, disliked = profile['liked_genres'], profile['disliked_genres']
+    weights = _per_genre(np, vectors['vocab'],
+                         lambda g: 12 * min(liked.get(g, 0), 3) - 18 * min(disliked.get(g, 0), 3))
+    base = vectors['base']
+    return (base + np.bincount(vectors['rows'], weights=weights[vectors['cols']], minlength=len(base))).tolist()
@@ -0,0 +1,97 @@
+"""Write-behind buffer for rows nobody waits on.
+
+A served recommendation is logged as a Recommendation row, but only as
+history: the response doesn't depend on it. With write-behind on, routes
+hand rows to a WriteBehind and return at once; a background thread inserts
+them in bulk - once `max_rows` are waiting or every `interval` seconds - so
+commit latency and fsyncs leave the request path and a burst of requests
+costs one transaction instead of one each.
+
+Rows that haven't reached the database yet are still visible to this
+process through `pending`, and `flush` writes them synchronously for code
+that is about to query them. Other processes can't see them until the
+flush; the caller has to carry what they need across (app.py uses the
+session). Whatever is left is flushed when the process
+exits. The writer is injected, so this module never imports the app.
+"""
+
+import atexit
+import threading
+
+
+class WriteBehind:
+    """Buffers rows for `write(rows)`, which inserts and commits them."""
+
+    def __init__(self, write, max_rows=100, interval=1.0):
+        self._write = write
+        self.max_rows = max_rows
+        self.interval = interval
+        self._rows = []
+        self._in_flight = []
+        self._closed = False
+        self._cond = threading.Condition()
+        self._writing = threading.Lock()   # held while a batch is being written
+        self._stats = {'queued': 0, 'batches': 0, 'written': 0, 'failed': 0}
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, rows):
+        with self._cond:
+            self._rows.extend(rows)
+            self._stats['queued'] += len(rows)
+            if len(self._rows) >= self.max_rows:
+                self._cond.notify()
+            closed = self._closed
+        if closed:
+            # Shutting down: nothing will come back for them.
+            self.flush()
+
+    def pending(self):
+        """Rows queued or being written but not yet committed."""
+        with self._cond:
+            return self._in_flight + self._rows
+
+    def _write_batch(self):
+        # Caller holds self._writing.
+        with self._cond:
+            batch, self._rows = self._rows, []
+            self._in_flight = batch
+        if not batch:
+            return
+        try:
+            self._write(batch)
+            written = True
+        except Exception as e:
+            print(f"Write-behind batch of {len(batch)} row(s) failed: {e}")
+            written = False
+        with self._cond:
+            self._in_flight = []
+            self._stats['batches'] += 1
+            self._stats['written' if written else 'failed'] += len(batch)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._rows) < self.max_rows:
+                    self._cond.wait(self.interval)
+                if self._closed:
+                    return
+            with self._writing:
+                self._write_batch()
+
+    def flush(self):
+        """Write everything queued so far before returning, including a batch
+        the background thread already has in flight."""
+        with self._writing:
+            self._write_batch()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, pending=len(self._rows) + len(self._in_flight))